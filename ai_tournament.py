@@ -1,11 +1,26 @@
 import time
 from game import Game, PLAYER1, PLAYER2
-from gui import GUI
 import json
 from datetime import datetime
 import os
 import csv
-import pandas as pd
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game_records import RecordWriter
+from results_store import ResultsStore, position_label
+
+
+def match_id(config1, config2):
+    # stable id of a pairing, used to resume a tournament in any order
+    return f"{config1['name']}-vs-{config2['name']}"
+
+
+def sort_matches(matches, match_pairs):
+    # put finished matches back in match_pairs order
+    order = {match_id(c1, c2): i for i, (c1, c2) in enumerate(match_pairs)}
+    matches.sort(key=lambda m: order.get(match_id(m["config1"], m["config2"]), len(order)))
+
 
 class AITournament:
     def __init__(self):
@@ -15,26 +30,95 @@ class AITournament:
         self.checkpoint_dir = os.path.join(self.results_dir, "checkpoints")
         if not os.path.exists(self.checkpoint_dir):
             os.makedirs(self.checkpoint_dir)
+        self.store_path = os.path.join(self.results_dir, "results.sqlite")
+        self._store = None
+
+    def __getstate__(self):
+        # match workers get a copy of the tournament, but never its database
+        state = self.__dict__.copy()
+        state["_store"] = None
+        return state
+
+    def store(self):
+        """The SQLite results store, opened on first use"""
+        if self._store is None:
+            self._store = ResultsStore(self.store_path)
+        return self._store
     
-    def save_checkpoint(self, all_results, current_match, total_matches, timestamp):
-        checkpoint = {
-            "timestamp": timestamp,
-            "current_match": current_match,
-            "total_matches": total_matches,
-            "matches": all_results["matches"]
-        }
-        checkpoint_file = os.path.join(self.checkpoint_dir, f"checkpoint_{timestamp}.json")
-        with open(checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f, indent=2)
-        print(f"Checkpoint saved: {checkpoint_file}")
-    
+    # Checkpoints are append-only JSON Lines logs: a header line, then one
+    # line per finished match, each synced to disk before the next match is
+    # recorded. A crash can at worst leave a partial last line, which the
+    # reader drops.
+
+    def checkpoint_path(self, timestamp):
+        return os.path.join(self.checkpoint_dir, f"checkpoint_{timestamp}.jsonl")
+
+    def save_checkpoint(self, match, total_matches, timestamp):
+        """Append one finished match to the checkpoint log"""
+        checkpoint_file = self.checkpoint_path(timestamp)
+        records = []
+        # an empty log is one whose torn header was cut off
+        if not os.path.exists(checkpoint_file) or os.path.getsize(checkpoint_file) == 0:
+            records.append({"type": "header", "timestamp": timestamp, "total_matches": total_matches})
+        records.append({"type": "match", **match})
+        with open(checkpoint_file, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read_checkpoint_log(self, checkpoint_file):
+        """Rebuild the checkpoint state by streaming a log, dropping a torn tail"""
+        checkpoint = {"timestamp": None, "total_matches": None, "matches": []}
+        good_bytes = 0
+        with open(checkpoint_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_bytes += len(line)
+                if record.get("type") == "header":
+                    checkpoint["timestamp"] = record["timestamp"]
+                    checkpoint["total_matches"] = record["total_matches"]
+                elif record.get("type") == "match":
+                    checkpoint["matches"].append({
+                        "config1": record["config1"],
+                        "config2": record["config2"],
+                        "results": record["results"]
+                    })
+            file_bytes = f.seek(0, os.SEEK_END)
+        if good_bytes < file_bytes:
+            # cut the incomplete record so that new matches append cleanly
+            print(f"Dropping {file_bytes - good_bytes} bytes of an incomplete record in {checkpoint_file}")
+            with open(checkpoint_file, 'r+b') as f:
+                f.truncate(good_bytes)
+        if checkpoint["timestamp"] is None:
+            # the header was torn, the file name still has the timestamp
+            name = os.path.basename(checkpoint_file)
+            checkpoint["timestamp"] = name[len("checkpoint_"):-len(".jsonl")]
+        checkpoint["current_match"] = len(checkpoint["matches"])
+        return checkpoint
+
+    def _migrate_json_checkpoint(self, checkpoint_file):
+        # checkpoints written before the log format: one big JSON document
+        with open(checkpoint_file, 'r') as f:
+            checkpoint = json.load(f)
+        for match in checkpoint["matches"]:
+            self.save_checkpoint(match, checkpoint["total_matches"], checkpoint["timestamp"])
+        os.remove(checkpoint_file)
+        return self.read_checkpoint_log(self.checkpoint_path(checkpoint["timestamp"]))
+
     def load_latest_checkpoint(self):
         if not os.path.exists(self.checkpoint_dir):
             print("No checkpoint directory found. Starting fresh tournament.")
             return None
         
         try:
-            checkpoints = [f for f in os.listdir(self.checkpoint_dir) if f.startswith("checkpoint_")]
+            checkpoints = [f for f in os.listdir(self.checkpoint_dir)
+                           if f.startswith("checkpoint_") and f.endswith((".jsonl", ".json"))]
             if not checkpoints:
                 print("No checkpoints found. Starting fresh tournament.")
                 return None
@@ -42,8 +126,10 @@ class AITournament:
             latest_checkpoint = max(checkpoints)
             checkpoint_file = os.path.join(self.checkpoint_dir, latest_checkpoint)
             
-            with open(checkpoint_file, 'r') as f:
-                checkpoint = json.load(f)
+            if checkpoint_file.endswith(".json"):
+                checkpoint = self._migrate_json_checkpoint(checkpoint_file)
+            else:
+                checkpoint = self.read_checkpoint_log(checkpoint_file)
             
             print(f"Loaded checkpoint: {checkpoint_file}")
             print(f"Progress: {checkpoint['current_match']}/{checkpoint['total_matches']} matches completed")
@@ -53,6 +139,49 @@ class AITournament:
             print("Starting fresh tournament.")
             return None
 
+    def compact_checkpoint(self, timestamp, match_pairs=None):
+        """Write the final tournament files from the checkpoint log and remove it"""
+        checkpoint_file = self.checkpoint_path(timestamp)
+        checkpoint = self.read_checkpoint_log(checkpoint_file)
+        all_results = {"timestamp": timestamp, "matches": checkpoint["matches"]}
+        # matches of checkpoints from before the store existed
+        store = self.store()
+        stored = store.match_ids(timestamp)
+        for match in all_results["matches"]:
+            if match_id(match["config1"], match["config2"]) not in stored:
+                store.add_match(timestamp, match_id(match["config1"], match["config2"]), match)
+        if match_pairs is not None:
+            sort_matches(all_results["matches"], match_pairs)
+        df = self.save_tournament_results(all_results, timestamp)
+        os.remove(checkpoint_file)
+        return df
+
+    def make_engine(self, game, config):
+        # configs with "engine": "mcts" play with a Monte Carlo tree search
+        # that keeps its tree for the whole game, the default is minimax
+        engine = config.get("engine", "minimax")
+        if engine == "minimax":
+            return None
+        if engine == "mcts":
+            from mcts import MCTSEngine
+            return MCTSEngine(game, policy=config.get("policy", "random"), seed=config.get("seed"))
+        raise ValueError(f"unknown engine {engine!r} in config {config.get('name')}")
+
+    def choose_action(self, game, player, config, engine=None):
+        # a config plays either with a per-move time control ("time", in
+        # seconds) or with a fixed search depth ("depth"); an MCTS engine
+        # runs "iterations" playouts or playouts for "time" seconds
+        if engine is not None:
+            return engine.best_action_for(player, config.get("iterations"), config.get("time"))
+        # minimax configs may pick their search and evaluation; each side
+        # has its own transposition table, which Game clears when that side
+        # searches with another evaluation, so they can differ per player
+        game.search = config.get("search", "alphabeta")
+        game.evaluation = config.get("evaluation", "mobility")
+        if config.get("time"):
+            return game.best_action_within(player, config["time"], config.get("depth"))
+        return game.best_action_for(player, config["depth"])
+
     def run_match(self, config1, config2, num_games=1):
         results = {
             "config1": config1,
@@ -61,10 +190,15 @@ class AITournament:
             "summary": {
                 "config1_wins": 0,
                 "config2_wins": 0,
+                "draws": 0,
                 "avg_moves": 0,
                 "avg_duration_sec": 0,
-                "config1_depth": config1["depth"],
-                "config2_depth": config2["depth"],
+                "config1_depth": config1.get("depth"),
+                "config2_depth": config2.get("depth"),
+                "config1_time": config1.get("time"),
+                "config2_time": config2.get("time"),
+                "config1_engine": config1.get("engine", "minimax"),
+                "config2_engine": config2.get("engine", "minimax"),
                 "config1_position": config1.get("start_pos", "default"),
                 "config2_position": config2.get("start_pos", "default")
             }
@@ -74,14 +208,13 @@ class AITournament:
         total_duration = 0
 
         for game_num in range(num_games):
-            game = Game(mode='AI vs AI', first_player=1)
+            game = Game(mode='AI vs AI', first_player=1, collect_stats=True)
 
             if 'start_pos' in config1:
-                x, y = config1['start_pos']
-                game.board[y][x] = PLAYER1
+                game.place_pawn(PLAYER1, config1['start_pos'])
             if 'start_pos' in config2:
-                x, y = config2['start_pos']
-                game.board[y][x] = PLAYER2
+                game.place_pawn(PLAYER2, config2['start_pos'])
+            engines = {PLAYER1: self.make_engine(game, config1), PLAYER2: self.make_engine(game, config2)}
 
             moves = 0
             game_record = {
@@ -98,8 +231,10 @@ class AITournament:
                 current_player = game.current_player
                 config = config1 if current_player == PLAYER1 else config2
 
-                action = game.best_action_for(current_player, config['depth'])
+                engine = engines[current_player]
+                action = self.choose_action(game, current_player, config, engine)
                 if action:
+                    searcher = engine or game
                     move, blacks = action
                     game.apply_move(move, current_player)
                     if blacks:
@@ -109,7 +244,8 @@ class AITournament:
                     game_record["moves"].append({
                         "player": "config1" if current_player == PLAYER1 else "config2",
                         "move": move,
-                        "blackouts": blacks
+                        "blackouts": blacks,
+                        "stats": searcher.last_stats.as_dict() if searcher.last_stats else None
                     })
 
                 game.current_player = PLAYER1 if current_player == PLAYER2 else PLAYER2
@@ -128,6 +264,8 @@ class AITournament:
                 winner = "config1" if game.current_player == PLAYER2 else "config2"
                 game_record["winner"] = winner
                 results["summary"][f"{winner}_wins"] += 1
+            else:
+                results["summary"]["draws"] += 1
 
             game_record["move_count"] = moves
             total_moves += moves
@@ -138,12 +276,81 @@ class AITournament:
 
         return results
 
+    def record_match(self, all_results, total_matches, config1, config2, results):
+        """Checkpoint and store one finished match; keep its summary in all_results"""
+        match = {
+            "config1": config1,
+            "config2": config2,
+            "results": results
+        }
+        # games and moves go to the checkpoint log and the store, only
+        # the summary is kept in memory
+        all_results["matches"].append({
+            "config1": config1,
+            "config2": config2,
+            "results": {"summary": results["summary"]}
+        })
+        done = len(all_results["matches"])
+        print(f"\nMatch {done}/{total_matches}: {config1['name']} vs {config2['name']}")
+        print(f"Results: {results['summary']}")
+        self.save_checkpoint(match, total_matches, all_results["timestamp"])
+        self.store().add_match(all_results["timestamp"], match_id(config1, config2), match)
+
+    def pending_pairs(self, match_pairs, all_results):
+        """The pairs of match_pairs that have no result in all_results yet"""
+        played = {match_id(m["config1"], m["config2"]) for m in all_results["matches"]}
+        pending = [(c1, c2) for c1, c2 in match_pairs if match_id(c1, c2) not in played]
+        print(f"{len(match_pairs) - len(pending)}/{len(match_pairs)} matches already played, {len(pending)} to go")
+        return pending
+
+    def run_matches(self, match_pairs, all_results, workers=1, num_games=1):
+        """Play every pair that has no result in all_results yet.
+
+        With workers > 1 the matches run on a process pool. Results are
+        recorded and checkpointed in this process as they complete, in any
+        order; at the end the matches are put back in match_pairs order.
+        """
+        total_matches = len(match_pairs)
+        pending = self.pending_pairs(match_pairs, all_results)
+
+        def record(config1, config2, results):
+            self.record_match(all_results, total_matches, config1, config2, results)
+
+        if workers <= 1:
+            for config1, config2 in pending:
+                record(config1, config2, self.run_match(config1, config2, num_games=num_games))
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = {executor.submit(self.run_match, config1, config2, num_games): (config1, config2)
+                           for config1, config2 in pending}
+                for future in as_completed(futures):
+                    config1, config2 = futures[future]
+                    record(config1, config2, future.result())
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
+
+        sort_matches(all_results["matches"], match_pairs)
+        return all_results
+
+    def save_game_archive(self, all_results, timestamp):
+        """Write the moves of every game as binary records (see game_records)"""
+        archive_filename = f"{self.results_dir}/tournament_{timestamp}.isog"
+        with open(archive_filename, 'wb') as f:
+            writer = RecordWriter(f)
+            for match in all_results["matches"]:
+                for game in match["results"].get("games", []):
+                    writer.write(game, match["config1"].get("start_pos"), match["config2"].get("start_pos"))
+        return archive_filename
 
     def save_tournament_results(self, all_results, timestamp):
         # Save detailed JSON results
         json_filename = f"{self.results_dir}/tournament_{timestamp}.json"
         with open(json_filename, 'w') as f:
             json.dump(all_results, f, indent=2)
+        archive_filename = self.save_game_archive(all_results, timestamp)
         
         # Create summary DataFrame
         summary_data = []
@@ -154,29 +361,35 @@ class AITournament:
             
             summary_data.append({
                 "config1_name": config1["name"],
-                "config1_depth": config1["depth"],
-                "config1_position": str(config1.get("start_pos", "default")),
+                "config1_depth": config1.get("depth"),
+                "config1_position": position_label(config1.get("start_pos")),
                 "config2_name": config2["name"],
-                "config2_depth": config2["depth"],
-                "config2_position": str(config2.get("start_pos", "default")),
+                "config2_depth": config2.get("depth"),
+                "config2_position": position_label(config2.get("start_pos")),
                 "config1_wins": summary["config1_wins"],
                 "config2_wins": summary["config2_wins"],                
                 "avg_moves": summary["avg_moves"],
                 "avg_duration_sec": summary["avg_duration_sec"]
             })
         
-        # Save CSV summary
+        # Save CSV summary (pandas is only needed here, so it is not loaded
+        # by match workers or by the command line)
+        import pandas as pd
         df = pd.DataFrame(summary_data)
         csv_filename = f"{self.results_dir}/tournament_summary_{timestamp}.csv"
         df.to_csv(csv_filename, index=False)
         
         print(f"\nResults saved:")
         print(f"- Detailed results: {json_filename}")
+        print(f"- Game records: {archive_filename}")
         print(f"- Summary CSV: {csv_filename}")
+        print(f"- Results database: {self.store_path}")
         
         return df
 
-def main():
+def main(workers=1, serve=None, lease_seconds=None):
+    """Run the tournament here, or with serve=(host, port) hand its matches
+    out to remote workers (see distributed_tournament)"""
     tournament = AITournament()
     
     # Define symmetrical position pairs (mirrored positions)
@@ -240,7 +453,6 @@ def main():
                 "timestamp": checkpoint["timestamp"],
                 "matches": checkpoint["matches"]
             }
-            start_match = len(checkpoint["matches"])
         else:
             checkpoint = None
     
@@ -253,23 +465,15 @@ def main():
             "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
             "matches": []
         }
-        start_match = 0
     
     try:
-        for match_num, (config1, config2) in enumerate(match_pairs[start_match:], start=start_match + 1):
-            print(f"\nMatch {match_num}/{total_matches}: {config1['name']} vs {config2['name']}")
-            results = tournament.run_match(config1, config2, num_games=1)
-            print(f"Results: {results['summary']}")
-            
-            all_results["matches"].append({
-                "config1": config1,
-                "config2": config2,
-                "results": results
-            })
-            
-            tournament.save_checkpoint(all_results, match_num, total_matches, all_results["timestamp"])
-        
-        tournament.save_tournament_results(all_results, all_results["timestamp"])
+        if serve:
+            from distributed_tournament import LEASE_SECONDS, Coordinator
+            Coordinator(tournament, match_pairs, all_results, serve, num_games=1,
+                        lease_seconds=lease_seconds or LEASE_SECONDS).run()
+        else:
+            tournament.run_matches(match_pairs, all_results, workers=workers, num_games=1)
+        tournament.compact_checkpoint(all_results["timestamp"], match_pairs)
         print("\nTournament completed successfully!")
     
     except Exception as e:
@@ -278,4 +482,15 @@ def main():
         raise
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the symmetrical AI tournament")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of matches played in parallel (default: 1)")
+    parser.add_argument("--serve", metavar="HOST:PORT",
+                        help="hand the matches out to remote workers instead (see distributed_tournament)")
+    parser.add_argument("--lease", type=float, help="seconds a worker may go silent before its match is reassigned")
+    args = parser.parse_args()
+    serve = None
+    if args.serve:
+        from distributed_tournament import parse_address
+        serve = parse_address(args.serve)
+    main(workers=args.workers, serve=serve, lease_seconds=args.lease) 
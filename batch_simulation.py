@@ -0,0 +1,221 @@
+"""NumPy batched self-play with cheap policies.
+
+Plays thousands of games at once for statistics on starting positions.
+The boards of a batch live in one ``(games, cells)`` boolean array, cells
+numbered like the bitboards (``x * size + y``).  Every ply computes the
+legal-move masks of the whole batch, picks and applies the moves, then the
+blackouts, and retires the games whose player to move is stuck.  All games
+of a batch start with the same player, so they stay in lockstep.
+
+Policies:
+
+- random: a uniformly random move and random blackouts
+- greedy: the move with the most free neighbours, and the blackouts that
+  take the opponent's best-connected moves, ties broken at random
+
+``BatchSimulator.run_match`` returns the results in the schema of
+AITournament.run_match (without the per-game records), so the visualizer
+reads them like any tournament match.
+
+numpy is only needed here; the search engine does not import this module.
+"""
+import random
+import time
+
+import numpy as np
+
+from bitboard import cell_index, neighbour_masks, popcount
+from game import BOARD_SIZE, PLAYER1, PLAYER2, Game, opposite
+
+POLICIES = ('random', 'greedy')
+MAX_MOVES = 100
+
+
+def _mask_matrix(masks, cells):
+    # neighbour masks as a (cells, cells) boolean matrix
+    return np.array([[mask >> j & 1 for j in range(cells)] for mask in masks], dtype=bool)
+
+
+class BatchSimulator:
+    """Batched games on one board size and blackout mode."""
+
+    def __init__(self, size=BOARD_SIZE, blackout_mode='legal', seed=None):
+        self.size = size
+        self.blackout_mode = blackout_mode
+        self.cells = size * size
+        self.near = _mask_matrix(neighbour_masks(size, 1), self.cells)
+        radius = 2 if blackout_mode == 'distant' else 1
+        self.targets = _mask_matrix(neighbour_masks(size, radius), self.cells)
+        self._near_counts = self.near.astype(np.float32)
+        self.rng = np.random.default_rng(seed)
+
+    def _start_cells(self, start1, start2):
+        # the Game defaults unless given
+        default = Game(size=self.size, tt_bytes=0)
+        cells = []
+        for player, start in ((PLAYER1, start1), (PLAYER2, start2)):
+            x, y = start if start is not None else default.get_pawn_position(player)
+            cells.append(cell_index(x, y, self.size))
+        return cells
+
+    def _choose(self, allowed, free, policy, count=1):
+        # indices of the `count` best allowed cells per row
+        score = self.rng.random(allowed.shape, dtype=np.float32)
+        if policy == 'greedy':
+            # free neighbours of every cell, the noise only breaks ties
+            score += free.astype(np.float32) @ self._near_counts
+        score[~allowed] = -1
+        if count == 1:
+            return score.argmax(axis=1)
+        return np.argpartition(-score, count - 1, axis=1)[:, :count]
+
+    def play(self, games, policy1='random', policy2='random', start1=None, start2=None,
+             first_player=PLAYER1, max_moves=MAX_MOVES):
+        """Play `games` games and return (winners, lengths).
+
+        winners[i] is PLAYER1, PLAYER2 or 0 for a game stopped as a draw
+        after `max_moves` moves, lengths[i] the number of moves played.
+        """
+        for policy in (policy1, policy2):
+            if policy not in POLICIES:
+                raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        policies = (None, policy1, policy2)
+        rows = np.arange(games)
+        pawns = np.empty((3, games), dtype=np.intp)
+        pawns[PLAYER1], pawns[PLAYER2] = self._start_cells(start1, start2)
+        blocked = np.zeros((games, self.cells), dtype=bool)
+        blocked[rows, pawns[PLAYER1]] = True
+        blocked[rows, pawns[PLAYER2]] = True
+        winners = np.zeros(games, dtype=np.int8)
+        lengths = np.full(games, max_moves, dtype=np.int32)
+
+        # indices of the games still running; the arrays below are cut
+        # down to them as games end
+        live = rows
+        player = first_player
+        for moves in range(max_moves):
+            other = opposite(player)
+            legal = self.near[pawns[player]] & ~blocked
+            stuck = ~legal.any(axis=1)
+            if stuck.any():
+                winners[live[stuck]] = other
+                lengths[live[stuck]] = moves
+                keep = ~stuck
+                live, legal, blocked, pawns = live[keep], legal[keep], blocked[keep], pawns[:, keep]
+                if not len(live):
+                    break
+            index = np.arange(len(live))
+
+            move = self._choose(legal, ~blocked, policies[player])
+            blocked[index, pawns[player]] = False
+            blocked[index, move] = True
+            pawns[player] = move
+
+            targets = self.targets[pawns[other]] & ~blocked
+            few = targets.sum(axis=1) <= 2
+            blocked[few] |= targets[few]
+            many = np.nonzero(~few)[0]
+            if len(many):
+                picks = self._choose(targets[many], ~blocked[many], policies[player], count=2)
+                blocked[many[:, None], picks] = True
+            player = other
+        return winners, lengths
+
+    def run_match(self, config1, config2, num_games=1000, max_moves=MAX_MOVES):
+        """Batched version of AITournament.run_match for policy configs.
+
+        Configs name a "policy" and may give a "start_pos"; config1 plays
+        PLAYER1 and moves first.
+        """
+        start = time.time()
+        winners, lengths = self.play(num_games, config1.get("policy", "random"),
+                                     config2.get("policy", "random"),
+                                     config1.get("start_pos"), config2.get("start_pos"),
+                                     max_moves=max_moves)
+        duration = time.time() - start
+        return {
+            "config1": config1,
+            "config2": config2,
+            "summary": {
+                "config1_wins": int((winners == PLAYER1).sum()),
+                "config2_wins": int((winners == PLAYER2).sum()),
+                "draws": int((winners == 0).sum()),
+                "avg_moves": float(lengths.mean()),
+                "avg_duration_sec": duration / num_games,
+                "config1_depth": config1.get("depth"),
+                "config2_depth": config2.get("depth"),
+                "config1_policy": config1.get("policy", "random"),
+                "config2_policy": config2.get("policy", "random"),
+                "config1_position": config1.get("start_pos", "default"),
+                "config2_position": config2.get("start_pos", "default")
+            }
+        }
+
+
+def _free_neighbours(game, cell):
+    return popcount(game._near[game._index(cell)] & ~game.blocked)
+
+
+def play_scalar(games, policy1='random', policy2='random', size=BOARD_SIZE,
+                blackout_mode='legal', seed=None, max_moves=MAX_MOVES):
+    """The same games one at a time on Game, for comparison.
+
+    Returns (winners, lengths) lists like BatchSimulator.play.
+    """
+    rng = random.Random(seed)
+    policies = (None, policy1, policy2)
+    winners, lengths = [], []
+    for _ in range(games):
+        game = Game(mode='AI vs AI', first_player=PLAYER1, blackout_mode=blackout_mode,
+                    size=size, tt_bytes=0)
+        winner = 0
+        for moves in range(max_moves):
+            player = game.current_player
+            other = opposite(player)
+            options = game.get_legal_moves(player)
+            if not options:
+                winner = other
+                break
+            if policies[player] == 'greedy':
+                move = max(options, key=lambda m: (_free_neighbours(game, m), rng.random()))
+            else:
+                move = rng.choice(options)
+            game.apply_move(move, player)
+            if blackout_mode == 'distant':
+                targets = game.get_distant_moves(other)
+            else:
+                targets = game.get_legal_moves(other)
+            if len(targets) > 2:
+                if policies[player] == 'greedy':
+                    targets.sort(key=lambda c: (_free_neighbours(game, c), rng.random()), reverse=True)
+                    targets = targets[:2]
+                else:
+                    targets = rng.sample(targets, 2)
+            game.apply_blackouts(targets)
+            game.current_player = other
+        else:
+            moves = max_moves
+        winners.append(winner)
+        lengths.append(moves)
+    return winners, lengths
+
+
+def compare_speed(games=10000, scalar_games=500, policy='random', blackout_mode='legal', seed=0):
+    """Games per second of the batched and the scalar simulation."""
+    simulator = BatchSimulator(blackout_mode=blackout_mode, seed=seed)
+    start = time.perf_counter()
+    winners, lengths = simulator.play(games, policy, policy)
+    batch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    play_scalar(scalar_games, policy, policy, blackout_mode=blackout_mode, seed=seed)
+    scalar_seconds = time.perf_counter() - start
+    return {
+        "policy": policy,
+        "blackout_mode": blackout_mode,
+        "batch_games": games,
+        "batch_games_per_sec": games / batch_seconds,
+        "scalar_games": scalar_games,
+        "scalar_games_per_sec": scalar_games / scalar_seconds,
+        "player1_win_rate": float((winners == PLAYER1).mean()),
+        "avg_moves": float(lengths.mean()),
+    }
@@ -0,0 +1,499 @@
+"""Engine benchmark over a fixed corpus of positions.
+
+Runs Game.best_action_for at fixed depths on every corpus position and
+records time, nodes, nodes per second and the chosen action, plus the
+cold start of the headless command line (a fresh interpreter up to the
+end of its first search).  Results are
+written as JSON and can be compared with a stored baseline: a case
+regresses when its node count or its time grows by more than the
+tolerance, and a changed action is reported as well.  Node counts do not
+depend on the machine, so they are the number to watch; times are only
+comparable against a baseline from the same machine.
+
+With --versus the Monte Carlo tree search player instead plays games
+against iterative deepening minimax, both with the same seconds per move
+and each side playing first in half of the games.  --eval-match plays the
+area evaluation against the mobility one at a fixed depth, from a set of
+starting positions with each evaluation on both sides.  --records plays
+games at depth 1 from random starts and compares the detailed JSON of
+their game records with the binary encoding of game_records: archive
+size, encode and decode throughput, and replay speed.
+
+Only the engine is imported, so this runs headless (no tkinter, pandas).
+
+    python benchmark.py                          # run, print, write JSON
+    python benchmark.py --baseline benchmark_baseline.json
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --search pvs --baseline benchmark_baseline.json
+    python benchmark.py --evaluation area        # speed of the area evaluation
+    python benchmark.py --versus 0.5 --games 10  # MCTS vs minimax
+    python benchmark.py --eval-match 3           # area vs mobility evaluation
+    python benchmark.py --records 200            # binary vs JSON game records
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from game import EVALUATIONS, PLAYER1, PLAYER2, SEARCHES, Game, opposite
+from game_records import RecordReader, RecordWriter
+from mcts import MCTSEngine
+
+# name -> (blackout mode, player to move, depths, board rows from y = 0 down)
+# '.' empty, '#' blackout, '1' / '2' pawns
+CORPUS = {
+    "opening": ("legal", PLAYER2, (3, 4), [
+        "........",
+        "........",
+        "1.......",
+        "........",
+        "........",
+        ".......2",
+        "........",
+        "........",
+    ]),
+    "midgame": ("legal", PLAYER1, (4, 5), [
+        "........",
+        "..#.....",
+        ".#1#....",
+        "..#.....",
+        ".....##.",
+        ".....2..",
+        ".....##.",
+        "........",
+    ]),
+    "crowded": ("legal", PLAYER2, (4, 5), [
+        "#..#.##.",
+        ".#..#..#",
+        "#.1..#..",
+        ".##.#.#.",
+        "#...#..#",
+        ".#.#..2.",
+        "..#.#..#",
+        "#..#.#..",
+    ]),
+    "partitioned": ("legal", PLAYER1, (4, 6), [
+        "..####..",
+        ".#####.#",
+        ".1####..",
+        "#.####.#",
+        "..####2.",
+        ".#####..",
+        "..####.#",
+        "#.####..",
+    ]),
+    "distant_open": ("distant", PLAYER1, (3,), [
+        "........",
+        "........",
+        "1.......",
+        "........",
+        "........",
+        ".......2",
+        "........",
+        "........",
+    ]),
+    "distant": ("distant", PLAYER1, (2, 3), [
+        ".###....",
+        ".###1...",
+        "........",
+        "........",
+        ".....#..",
+        "....##..",
+        "...##.2.",
+        "...#....",
+    ]),
+}
+
+DEFAULT_TOLERANCE = 0.25
+# timings this short are mostly noise, so they may always grow by this much
+TIME_SLACK = 0.01
+COLD_START_RUNS = 5
+COLD_START_COMMAND = ["cli.py", "search", "--depth", "1"]
+# (player 1 cell, player 2 cell) starts of the --eval-match games
+EVAL_MATCH_STARTS = [
+    ((0, 2), (7, 5)),
+    ((3, 3), (4, 4)),
+    ((4, 3), (3, 4)),
+    ((2, 2), (5, 5)),
+    ((1, 1), (6, 6)),
+    ((3, 0), (4, 7)),
+]
+
+
+def load_position(name, **game_options):
+    blackout_mode, player, _, rows = CORPUS[name]
+    game = Game(mode='AI vs AI', first_player=player, blackout_mode=blackout_mode, **game_options)
+    for y, row in enumerate(rows):
+        for x, c in enumerate(row):
+            if c == '1':
+                game.place_pawn(PLAYER1, (x, y))
+            elif c == '2':
+                game.place_pawn(PLAYER2, (x, y))
+    game.apply_blackouts([(x, y) for y, row in enumerate(rows) for x, c in enumerate(row) if c == '#'])
+    return game
+
+
+def run_case(name, depth, search='alphabeta', evaluation='mobility'):
+    # a fresh game per case so that no transposition table entries carry over
+    game = load_position(name, collect_stats=True, search=search, evaluation=evaluation)
+    player = CORPUS[name][1]
+    start = time.perf_counter()
+    action = game.best_action_for(player, depth)
+    seconds = time.perf_counter() - start
+    nodes = game.last_stats.nodes
+    return {
+        "position": name,
+        "blackout_mode": game.blackout_mode,
+        "depth": depth,
+        "seconds": seconds,
+        "nodes": nodes,
+        "nodes_per_sec": nodes / seconds if seconds > 0 else 0.0,
+        # as JSON reads it back, so that runs and baselines compare equal
+        "action": json.loads(json.dumps(action)),
+    }
+
+
+def measure_cold_start(runs=COLD_START_RUNS):
+    """Median wall time of a new interpreter running a depth 1 search."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + COLD_START_COMMAND, cwd=here, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_benchmark(names=None, verbose=True, search='alphabeta', evaluation='mobility'):
+    results = []
+    for name in names or CORPUS:
+        for depth in CORPUS[name][2]:
+            result = run_case(name, depth, search, evaluation)
+            results.append(result)
+            if verbose:
+                print(f"{name:12s} d{depth}  {result['seconds']:8.3f}s  {result['nodes']:9d} nodes  "
+                      f"{result['nodes_per_sec']:9.0f} n/s  {result['action']}")
+    cold_start = measure_cold_start()
+    if verbose:
+        print(f"{'cold start':12s}     {cold_start:8.3f}s  ({' '.join(COLD_START_COMMAND)})")
+    return {
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "search": search,
+        "evaluation": evaluation,
+        "cold_start_sec": cold_start,
+        "results": results,
+    }
+
+
+def play_versus(seconds, mcts_player, seed=None, max_plies=100):
+    """One game of MCTS against minimax at `seconds` per move.
+
+    Returns the winning engine ("mcts", "minimax" or None for a draw) and
+    the MCTS rollouts per second over the game.
+    """
+    game = Game(mode='AI vs AI', first_player=PLAYER1)
+    engine = MCTSEngine(game, seed=seed)
+    rollouts = 0
+    mcts_seconds = 0.0
+    for _ in range(max_plies):
+        if game.is_terminal():
+            break
+        player = game.current_player
+        if player == mcts_player:
+            move, blacks = engine.best_action_for(player, seconds=seconds)
+            rollouts += engine.last_stats.rollouts
+            mcts_seconds += engine.last_stats.seconds
+        else:
+            move, blacks = game.best_action_within(player, seconds)
+        game.apply_move(move, player)
+        if blacks:
+            game.apply_blackouts(blacks)
+        game.current_player = opposite(player)
+    winner = None
+    if game.is_terminal():
+        winner = "mcts" if game.current_player != mcts_player else "minimax"
+    return winner, rollouts / mcts_seconds if mcts_seconds > 0 else 0.0
+
+
+def run_versus(seconds, games, verbose=True):
+    wins = {"mcts": 0, "minimax": 0, None: 0}
+    rates = []
+    for n in range(games):
+        mcts_player = PLAYER1 if n % 2 == 0 else PLAYER2
+        winner, rate = play_versus(seconds, mcts_player, seed=n)
+        wins[winner] += 1
+        rates.append(rate)
+        if verbose:
+            print(f"game {n + 1:3d}  mcts as player {mcts_player}  winner {winner or 'draw':8s}  "
+                  f"{rate:9.0f} rollouts/s")
+    result = {
+        "seconds_per_move": seconds,
+        "games": games,
+        "mcts_wins": wins["mcts"],
+        "minimax_wins": wins["minimax"],
+        "draws": wins[None],
+        "rollouts_per_sec": statistics.mean(rates) if rates else 0.0,
+    }
+    if verbose:
+        print(f"MCTS {result['mcts_wins']} - {result['minimax_wins']} minimax, {result['draws']} draws "
+              f"at {seconds}s per move ({result['rollouts_per_sec']:.0f} rollouts/s)")
+    return result
+
+
+def play_evaluations(depth, start, area_player, max_plies=100):
+    """One game of the area evaluation against the mobility one.
+
+    Returns the winning evaluation (or None for a draw) and the seconds
+    each evaluation spent searching.
+    """
+    game = Game(mode='AI vs AI', first_player=PLAYER1)
+    game.place_pawn(PLAYER1, start[0])
+    game.place_pawn(PLAYER2, start[1])
+    seconds = {"area": 0.0, "mobility": 0.0}
+    for _ in range(max_plies):
+        if game.is_terminal():
+            break
+        player = game.current_player
+        # each side keeps its own transposition table, filled with its own
+        # evaluation only, so switching the evaluation between moves keeps
+        # both tables (see Game._select_table)
+        game.evaluation = "area" if player == area_player else "mobility"
+        started = time.perf_counter()
+        move, blacks = game.best_action_for(player, depth)
+        seconds[game.evaluation] += time.perf_counter() - started
+        game.apply_move(move, player)
+        if blacks:
+            game.apply_blackouts(blacks)
+        game.current_player = opposite(player)
+    winner = None
+    if game.is_terminal():
+        winner = "area" if game.current_player != area_player else "mobility"
+    return winner, seconds
+
+
+def run_eval_match(depth, verbose=True):
+    wins = {"area": 0, "mobility": 0, None: 0}
+    seconds = {"area": 0.0, "mobility": 0.0}
+    for start in EVAL_MATCH_STARTS:
+        for area_player in (PLAYER1, PLAYER2):
+            winner, spent = play_evaluations(depth, start, area_player)
+            wins[winner] += 1
+            for name in seconds:
+                seconds[name] += spent[name]
+            if verbose:
+                print(f"start {start}  area as player {area_player}  winner {winner or 'draw':8s}  "
+                      f"area {spent['area']:.2f}s  mobility {spent['mobility']:.2f}s")
+    result = {
+        "depth": depth,
+        "games": 2 * len(EVAL_MATCH_STARTS),
+        "area_wins": wins["area"],
+        "mobility_wins": wins["mobility"],
+        "draws": wins[None],
+        "area_seconds": seconds["area"],
+        "mobility_seconds": seconds["mobility"],
+    }
+    if verbose:
+        print(f"area {result['area_wins']} - {result['mobility_wins']} mobility, {result['draws']} draws "
+              f"at depth {depth} (search time {seconds['area']:.1f}s vs {seconds['mobility']:.1f}s)")
+    return result
+
+
+def play_record(start1, start2, depth=1):
+    # one game in the game_record schema of AITournament.run_match
+    game = Game(mode='AI vs AI', first_player=PLAYER1, tt_bytes=0, collect_stats=True)
+    game.place_pawn(PLAYER1, start1)
+    game.place_pawn(PLAYER2, start2)
+    record = {"moves": [], "winner": None, "move_count": 0, "duration_sec": 0, "blackout_positions": []}
+    start = time.perf_counter()
+    while not game.is_terminal() and len(record["moves"]) <= 100:
+        player = game.current_player
+        move, blacks = game.best_action_for(player, depth)
+        game.apply_move(move, player)
+        game.apply_blackouts(blacks)
+        record["blackout_positions"].extend(blacks)
+        record["moves"].append({"player": "config1" if player == PLAYER1 else "config2", "move": move,
+                                "blackouts": blacks, "stats": game.last_stats.as_dict()})
+        game.current_player = opposite(player)
+    record["duration_sec"] = time.perf_counter() - start
+    record["move_count"] = len(record["moves"])
+    if game.is_terminal():
+        record["winner"] = "config1" if game.current_player == PLAYER2 else "config2"
+    else:
+        record["winner"] = "draw"
+    return record
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else 0.0
+
+
+def run_records(games, seed=0, verbose=True):
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(8) for y in range(8)]
+    setups, records = [], []
+    for _ in range(games):
+        start1, start2 = rng.sample(cells, 2)
+        setups.append((start1, start2))
+        records.append(play_record(start1, start2))
+    moves = sum(record["move_count"] for record in records)
+    # as the tournament JSON stores them (the stats included), and the
+    # moves alone, which is what the binary records keep
+    bare = [{**record, "moves": [{k: v for k, v in move.items() if k != "stats"} for move in record["moves"]]}
+            for record in records]
+
+    start = time.perf_counter()
+    detailed = json.dumps(records, indent=2).encode()
+    json_encode = time.perf_counter() - start
+    compact = json.dumps(bare, separators=(",", ":")).encode()
+    start = time.perf_counter()
+    json.loads(detailed)
+    json_decode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    writer = RecordWriter(buffer)
+    for record, (start1, start2) in zip(records, setups):
+        writer.write(record, start1, start2)
+    binary = buffer.getvalue()
+    binary_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = list(RecordReader(io.BytesIO(binary)))
+    binary_read = time.perf_counter() - start
+    start = time.perf_counter()
+    for record in decoded:
+        record.moves()
+    binary_decode = binary_read + time.perf_counter() - start
+    start = time.perf_counter()
+    states = sum(1 for record in decoded for _ in record.states())
+    replay = time.perf_counter() - start
+
+    result = {
+        "games": games,
+        "moves": moves,
+        "json_bytes": len(detailed),
+        "json_moves_only_bytes": len(compact),
+        "binary_bytes": len(binary),
+        "json_encode_moves_per_sec": _rate(moves, json_encode),
+        "json_decode_moves_per_sec": _rate(moves, json_decode),
+        "binary_encode_moves_per_sec": _rate(moves, binary_encode),
+        "binary_read_moves_per_sec": _rate(moves, binary_read),
+        "binary_decode_moves_per_sec": _rate(moves, binary_decode),
+        "replay_states_per_sec": _rate(states, replay),
+    }
+    if verbose:
+        print(f"{games} games, {moves} moves")
+        print(f"size: JSON {len(detailed)} bytes, JSON without stats {len(compact)} bytes, "
+              f"binary {len(binary)} bytes ({len(detailed) / len(binary):.0f}x / "
+              f"{len(compact) / len(binary):.1f}x smaller)")
+        print(f"encode: JSON {result['json_encode_moves_per_sec']:.0f} moves/s, "
+              f"binary {result['binary_encode_moves_per_sec']:.0f} moves/s")
+        print(f"decode: JSON {result['json_decode_moves_per_sec']:.0f} moves/s, "
+              f"binary {result['binary_decode_moves_per_sec']:.0f} moves/s "
+              f"({result['binary_read_moves_per_sec']:.0f} moves/s reading packed records)")
+        print(f"replay: {result['replay_states_per_sec']:.0f} positions/s")
+    return result
+
+
+def settings(run):
+    # (search, evaluation) of a run; baselines from before these options
+    # were recorded used the defaults
+    return run.get("search", "alphabeta"), run.get("evaluation", "mobility")
+
+
+def compare(run, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Lines describing every regression of ``run`` against ``baseline``."""
+    previous = {(r["position"], r["depth"]): r for r in baseline["results"]}
+    problems = []
+    for result in run["results"]:
+        key = (result["position"], result["depth"])
+        base = previous.get(key)
+        if base is None:
+            continue
+        label = f"{key[0]} d{key[1]}"
+        if result["nodes"] > base["nodes"] * (1 + tolerance):
+            problems.append(f"{label}: nodes {base['nodes']} -> {result['nodes']}")
+        if result["seconds"] > base["seconds"] * (1 + tolerance) + TIME_SLACK:
+            problems.append(f"{label}: time {base['seconds']:.3f}s -> {result['seconds']:.3f}s")
+        if result["action"] != base["action"]:
+            problems.append(f"{label}: action {base['action']} -> {result['action']}")
+    base_start = baseline.get("cold_start_sec")
+    if base_start is not None and run["cold_start_sec"] > base_start * (1 + tolerance) + TIME_SLACK:
+        problems.append(f"cold start: {base_start:.3f}s -> {run['cold_start_sec']:.3f}s")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Isolation search engine")
+    parser.add_argument("--positions", nargs="+", choices=sorted(CORPUS), help="corpus positions to run")
+    parser.add_argument("--output", help="where to write the results (default: benchmark_results/)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--search", choices=SEARCHES, default="alphabeta",
+                        help="search algorithm (default: %(default)s)")
+    parser.add_argument("--evaluation", choices=EVALUATIONS, default="mobility",
+                        help="evaluation function (default: %(default)s)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative growth of nodes and time (default: %(default)s)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also store this run as a baseline")
+    parser.add_argument("--versus", type=float, metavar="SECONDS",
+                        help="play MCTS against minimax at SECONDS per move instead")
+    parser.add_argument("--games", type=int, default=10, help="games for --versus (default: %(default)s)")
+    parser.add_argument("--eval-match", type=int, metavar="DEPTH",
+                        help="play the area evaluation against the mobility one at DEPTH instead")
+    parser.add_argument("--records", type=int, metavar="GAMES",
+                        help="compare binary and JSON game records over GAMES games instead")
+    args = parser.parse_args(argv)
+
+    if args.versus:
+        run_versus(args.versus, args.games)
+        return 0
+    if args.eval_match:
+        run_eval_match(args.eval_match)
+        return 0
+    if args.records:
+        run_records(args.records)
+        return 0
+
+    run = run_benchmark(args.positions, search=args.search, evaluation=args.evaluation)
+
+    output = args.output
+    if output is None:
+        os.makedirs("benchmark_results", exist_ok=True)
+        output = os.path.join("benchmark_results", f"benchmark_{run['timestamp']}.json")
+    for path in filter(None, (output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Results saved: {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(run, baseline, args.tolerance)
+        if settings(run) != settings(baseline):
+            # node counts of another search or evaluation are not regressions
+            print(f"\n{args.baseline} used search {settings(baseline)[0]} and evaluation "
+                  f"{settings(baseline)[1]}, this run {settings(run)[0]} and {settings(run)[1]}; "
+                  f"differences for information only:")
+            for line in problems:
+                print(f"- {line}")
+            return 0
+        if problems:
+            print(f"\n{len(problems)} regression(s) against {args.baseline}:")
+            for line in problems:
+                print(f"- {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Bitboard helpers for the Isolation board.
+
+A set of cells is stored as a single int with one bit per cell.  Cells are
+numbered column-major (``x * size + y``) so that walking the bits from low to
+high visits cells in the same ``(x, y)`` order the list based move generators
+have always produced.
+"""
+from functools import lru_cache
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+def cell_index(x, y, size):
+    return x * size + y
+
+
+def cell_coords(index, size):
+    return divmod(index, size)
+
+
+@lru_cache(maxsize=None)
+def cell_bits(size):
+    """``cell_bits(size)[i]`` is the mask holding only cell ``i``."""
+    return tuple(1 << i for i in range(size * size))
+
+
+@lru_cache(maxsize=None)
+def neighbour_masks(size, radius):
+    """For every cell, the mask of cells within ``radius`` king steps of it."""
+    masks = []
+    for index in range(size * size):
+        x0, y0 = cell_coords(index, size)
+        mask = 0
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                if dx == 0 and dy == 0:
+                    continue
+                x, y = x0 + dx, y0 + dy
+                if 0 <= x < size and 0 <= y < size:
+                    mask |= 1 << cell_index(x, y, size)
+        masks.append(mask)
+    return tuple(masks)
+
+
+def bit_list(mask):
+    """Indices of the set bits of ``mask``, lowest first."""
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+
+@lru_cache(maxsize=None)
+def symmetry_maps(size):
+    """The 8 rotations and reflections of the board as cell permutations.
+
+    ``symmetry_maps(size)[t][i]`` is the cell that cell ``i`` moves to under
+    transform ``t``; transform 0 is the identity.
+    """
+    n = size - 1
+    transforms = (
+        lambda x, y: (x, y),
+        lambda x, y: (n - y, x),        # rotate 90
+        lambda x, y: (n - x, n - y),    # rotate 180
+        lambda x, y: (y, n - x),        # rotate 270
+        lambda x, y: (n - x, y),        # mirror left-right
+        lambda x, y: (x, n - y),        # mirror top-bottom
+        lambda x, y: (y, x),            # main diagonal
+        lambda x, y: (n - y, n - x),    # anti-diagonal
+    )
+    maps = []
+    for transform in transforms:
+        maps.append(tuple(cell_index(*transform(*cell_coords(i, size)), size)
+                          for i in range(size * size)))
+    return tuple(maps)
+
+
+@lru_cache(maxsize=None)
+def inverse_symmetry_maps(size):
+    inverses = []
+    for perm in symmetry_maps(size):
+        inverse = [0] * len(perm)
+        for i, j in enumerate(perm):
+            inverse[j] = i
+        inverses.append(tuple(inverse))
+    return tuple(inverses)
+
+
+def transform_mask(mask, perm):
+    out = 0
+    for i in bit_list(mask):
+        out |= 1 << perm[i]
+    return out
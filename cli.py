@@ -0,0 +1,236 @@
+"""Headless command line for the Isolation engine.
+
+Imports only the engine, so it starts fast and never needs a display:
+
+    python cli.py search --p1 0,2 --p2 7,5 --depth 4
+    python cli.py play --depth1 3 --depth2 4 --show
+    python cli.py tournament --workers 4
+    python cli.py tournament --serve :5555 & python cli.py worker --connect localhost:5555
+    python cli.py simulate --games 100000 --policy1 greedy --compare
+    python cli.py serve --port 5556 --workers 4
+
+pandas is only loaded when a tournament writes its summary, numpy only by
+simulate.
+"""
+import argparse
+import sys
+import time
+
+from game import BLACKOUT, BOARD_SIZE, EVALUATIONS, PLAYER1, PLAYER2, SEARCHES, Game, opposite
+
+SYMBOLS = {PLAYER1: '1', PLAYER2: '2', BLACKOUT: '#'}
+
+
+def parse_cell(text):
+    x, y = text.split(',')
+    return int(x), int(y)
+
+
+def render(game):
+    """The board as text, one row per y: '.' empty, '#' blackout, '1' / '2' pawns"""
+    return '\n'.join(''.join(SYMBOLS.get(game.cell((x, y)), '.') for x in range(game.size))
+                     for y in range(game.size))
+
+
+def new_game(args, player=PLAYER1):
+    game = Game(mode='AI vs AI', first_player=player, blackout_mode=args.mode,
+                size=args.size, collect_stats=args.stats, search=args.search, evaluation=args.evaluation)
+    if args.p1:
+        game.place_pawn(PLAYER1, parse_cell(args.p1))
+    if args.p2:
+        game.place_pawn(PLAYER2, parse_cell(args.p2))
+    return game
+
+
+def choose_action(game, player, depth, seconds, workers=None):
+    if seconds:
+        return game.best_action_within(player, seconds, depth)
+    return game.best_action_for(player, depth, workers=workers)
+
+
+def print_stats(game):
+    if game.last_stats is not None:
+        for key, value in game.last_stats.as_dict().items():
+            print(f"  {key}: {value}")
+
+
+def cmd_search(args):
+    if args.depth is None and not args.time:
+        args.depth = 3
+    game = new_game(args, args.player)
+    if args.blackouts:
+        game.apply_blackouts([parse_cell(cell) for cell in args.blackouts])
+    start = time.perf_counter()
+    action = choose_action(game, args.player, args.depth, args.time, args.workers)
+    elapsed = time.perf_counter() - start
+    if args.show:
+        print(render(game))
+    if action is None:
+        print(f"Player {args.player} has no move")
+    else:
+        move, blacks = action
+        print(f"Player {args.player}: move {move}, blackouts {blacks}")
+    depth = f"depth {game.last_depth}" if args.time else f"depth {args.depth}"
+    print(f"Search: {elapsed:.3f}s, {depth}")
+    if args.stats:
+        print_stats(game)
+    return 0
+
+
+def cmd_play(args):
+    game = new_game(args, args.first)
+    depths = {PLAYER1: args.depth1, PLAYER2: args.depth2}
+    times = {PLAYER1: args.time1, PLAYER2: args.time2}
+    plies = 0
+    start = time.perf_counter()
+    while not game.is_terminal() and plies < args.max_plies:
+        player = game.current_player
+        action = choose_action(game, player, depths[player], times[player])
+        move, blacks = action
+        game.apply_move(move, player)
+        if blacks:
+            game.apply_blackouts(blacks)
+        game.current_player = opposite(player)
+        plies += 1
+        if args.show:
+            print(f"\n{plies}. Player {player}: move {move}, blackouts {blacks}")
+            print(render(game))
+            if args.stats:
+                print_stats(game)
+    elapsed = time.perf_counter() - start
+    if game.is_terminal():
+        print(f"\nPlayer {opposite(game.current_player)} wins after {plies} moves ({elapsed:.2f}s)")
+    else:
+        print(f"\nDraw: stopped after {plies} moves ({elapsed:.2f}s)")
+    return 0
+
+
+def cmd_tournament(args):
+    import ai_tournament
+    serve = None
+    if args.serve:
+        from distributed_tournament import parse_address
+        serve = parse_address(args.serve)
+    ai_tournament.main(workers=args.workers, serve=serve, lease_seconds=args.lease)
+    return 0
+
+
+def cmd_worker(args):
+    from distributed_tournament import parse_address, run_worker
+    run_worker(parse_address(args.connect), name=args.name)
+    return 0
+
+
+def cmd_simulate(args):
+    from batch_simulation import BatchSimulator, compare_speed
+    simulator = BatchSimulator(size=args.size, blackout_mode=args.mode, seed=args.seed)
+    config1 = {"name": f"{args.policy1}_p1", "policy": args.policy1}
+    config2 = {"name": f"{args.policy2}_p2", "policy": args.policy2}
+    if args.p1:
+        config1["start_pos"] = parse_cell(args.p1)
+    if args.p2:
+        config2["start_pos"] = parse_cell(args.p2)
+    start = time.perf_counter()
+    results = simulator.run_match(config1, config2, args.games, args.max_plies)
+    elapsed = time.perf_counter() - start
+    for key, value in results["summary"].items():
+        print(f"  {key}: {value}")
+    print(f"{args.games} games in {elapsed:.2f}s ({args.games / elapsed:.0f} games/s)")
+    if args.compare:
+        for policy in sorted({args.policy1, args.policy2}):
+            speed = compare_speed(args.games, args.scalar_games, policy, args.mode, args.seed)
+            print(f"{policy}: batched {speed['batch_games_per_sec']:.0f} games/s, "
+                  f"Game {speed['scalar_games_per_sec']:.0f} games/s")
+    return 0
+
+
+def cmd_serve(args):
+    from engine_server import serve
+    # limits not given keep the server's defaults
+    options = {"workers": args.workers, "queue_size": args.queue, "cache_entries": args.cache,
+               "max_depth": args.max_depth, "max_seconds": args.max_time}
+    serve(args.host, args.port, stdio=args.stdio,
+          **{name: value for name, value in options.items() if value is not None})
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless Isolation engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--mode", choices=("legal", "distant"), default="legal", help="blackout mode")
+    common.add_argument("--size", type=int, default=BOARD_SIZE, help="board size (default: %(default)s)")
+    common.add_argument("--p1", metavar="X,Y", help="player 1 pawn cell")
+    common.add_argument("--p2", metavar="X,Y", help="player 2 pawn cell")
+    common.add_argument("--show", action="store_true", help="print the board")
+    common.add_argument("--stats", action="store_true", help="print search statistics")
+    common.add_argument("--search", choices=SEARCHES, default="alphabeta", help="search algorithm")
+    common.add_argument("--evaluation", choices=EVALUATIONS, default="mobility", help="evaluation function")
+
+    search = commands.add_parser("search", parents=[common], help="best action for one position")
+    search.add_argument("--player", type=int, choices=(PLAYER1, PLAYER2), default=PLAYER2)
+    search.add_argument("--blackouts", nargs="+", metavar="X,Y", help="blacked out cells")
+    search.add_argument("--depth", type=int, help="search depth (default: 3), or maximum depth with --time")
+    search.add_argument("--time", type=float, help="seconds for an iterative deepening search")
+    search.add_argument("--workers", type=int, help="processes for a parallel root search")
+    search.set_defaults(run=cmd_search)
+
+    play = commands.add_parser("play", parents=[common], help="AI vs AI game")
+    play.add_argument("--first", type=int, choices=(PLAYER1, PLAYER2), default=PLAYER1)
+    play.add_argument("--depth1", type=int, default=3)
+    play.add_argument("--depth2", type=int, default=3)
+    play.add_argument("--time1", type=float, help="seconds per move for player 1")
+    play.add_argument("--time2", type=float, help="seconds per move for player 2")
+    play.add_argument("--max-plies", type=int, default=100)
+    play.set_defaults(run=cmd_play)
+
+    tournament = commands.add_parser("tournament", help="symmetrical AI tournament")
+    tournament.add_argument("--workers", type=int, default=1)
+    tournament.add_argument("--serve", metavar="HOST:PORT",
+                            help="coordinate remote workers instead of playing here")
+    tournament.add_argument("--lease", type=float,
+                            help="seconds a worker may go silent before its match is reassigned")
+    tournament.set_defaults(run=cmd_tournament)
+
+    worker = commands.add_parser("worker", help="play tournament matches for a coordinator")
+    worker.add_argument("--connect", metavar="HOST:PORT", required=True, help="coordinator address")
+    worker.add_argument("--name", help="worker name in the coordinator's log (default: host name)")
+    worker.set_defaults(run=cmd_worker)
+
+    simulate = commands.add_parser("simulate", help="batched self-play with cheap policies (needs numpy)")
+    simulate.add_argument("--mode", choices=("legal", "distant"), default="legal", help="blackout mode")
+    simulate.add_argument("--size", type=int, default=BOARD_SIZE, help="board size (default: %(default)s)")
+    simulate.add_argument("--p1", metavar="X,Y", help="player 1 pawn cell")
+    simulate.add_argument("--p2", metavar="X,Y", help="player 2 pawn cell")
+    simulate.add_argument("--policy1", choices=("random", "greedy"), default="random")
+    simulate.add_argument("--policy2", choices=("random", "greedy"), default="random")
+    simulate.add_argument("--games", type=int, default=10000)
+    simulate.add_argument("--max-plies", type=int, default=100)
+    simulate.add_argument("--seed", type=int)
+    simulate.add_argument("--compare", action="store_true",
+                          help="also time the same games played one by one on Game")
+    simulate.add_argument("--scalar-games", type=int, default=500,
+                          help="games for the --compare timing of Game (default: %(default)s)")
+    simulate.set_defaults(run=cmd_simulate)
+
+    serve = commands.add_parser("serve", help="engine server for concurrent clients (JSON Lines)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5556)
+    serve.add_argument("--stdio", action="store_true", help="serve stdin/stdout instead of TCP")
+    serve.add_argument("--workers", type=int, help="search processes (default: one per CPU)")
+    serve.add_argument("--queue", type=int, help="requests waiting for a worker before clients are held back")
+    serve.add_argument("--cache", type=int, help="cached results")
+    serve.add_argument("--max-depth", type=int, help="deepest search a request may ask for")
+    serve.add_argument("--max-time", type=float, help="longest search a request may ask for, in seconds")
+    serve.set_defaults(run=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
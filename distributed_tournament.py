@@ -0,0 +1,290 @@
+"""Tournament matches spread over worker processes on other machines.
+
+The coordinator owns the queue of unplayed pairs and the checkpoint; any
+number of workers connect to it over TCP, take one match at a time, play
+it with AITournament.run_match and send the results back.
+
+    python cli.py tournament --serve 0.0.0.0:5555          # coordinator
+    python cli.py worker --connect coordinator:5555         # on each machine
+
+The protocol is JSON Lines, one message per line.  A worker sends
+
+- {"type": "hello", "worker": name}
+- {"type": "lease"}, answered by {"type": "match", "lease", "match_id",
+  "config1", "config2", "num_games", "heartbeat"}, by {"type": "wait",
+  "seconds"} while the last matches are out, or by {"type": "done"}
+- {"type": "heartbeat", "lease"} every "heartbeat" seconds while it
+  plays, not answered
+- {"type": "result", "lease", "match_id", "results"}, answered by
+  {"type": "ok"} or by {"type": "stale"} when the match was already
+  recorded from another worker
+
+A lease lasts lease_seconds from the last heartbeat.  The match of a
+worker that disconnects goes back to the front of the queue at once, the
+one of an expired lease (a hung worker or a lost machine) as soon as the
+coordinator notices.  The first result of a match wins; the coordinator
+alone writes the checkpoint and the results store, from its main thread,
+so a tournament resumes exactly like a local one.
+"""
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+from ai_tournament import AITournament, match_id
+
+LEASE_SECONDS = 60
+# seconds a worker waits before asking again while the last matches are out
+WAIT_SECONDS = 1.0
+CONNECT_SECONDS = 30
+
+
+def parse_address(text):
+    """(host, port) from "host:port" or ":port" (all interfaces)"""
+    host, _, port = text.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def send(sock, message):
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def receive(reader):
+    # the next message, or None once the peer has closed the connection
+    line = reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # one thread per worker connection
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = coordinator.connect(self.client_address)
+        try:
+            while True:
+                message = receive(self.rfile)
+                if message is None:
+                    break
+                reply = coordinator.dispatch(worker, message)
+                if reply is not None:
+                    send(self.request, reply)
+        except (OSError, ValueError) as e:
+            print(f"Worker {worker}: connection lost ({e})")
+        finally:
+            coordinator.disconnect(worker)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator:
+    """Hands out the pending pairs of a tournament to remote workers.
+
+    `run` serves until every pending match is recorded, recording results
+    with AITournament.record_match as they arrive.
+    """
+
+    def __init__(self, tournament, match_pairs, all_results, address, num_games=1,
+                 lease_seconds=LEASE_SECONDS):
+        self.tournament = tournament
+        self.all_results = all_results
+        self.total_matches = len(match_pairs)
+        self.num_games = num_games
+        self.lease_seconds = lease_seconds
+        self.pairs = {match_id(c1, c2): (c1, c2)
+                      for c1, c2 in tournament.pending_pairs(match_pairs, all_results)}
+        self.queue = deque(self.pairs)
+        # lease id -> [match id, worker, deadline]
+        self.leases = {}
+        self.finished = set()
+        self.lock = threading.Lock()
+        self.results = queue.Queue()
+        self._lease_ids = itertools.count(1)
+        self._worker_ids = itertools.count(1)
+        self.names = {}
+        self.server = _Server(address, _Handler)
+        self.server.coordinator = self
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def connect(self, client_address):
+        with self.lock:
+            worker = next(self._worker_ids)
+            self.names[worker] = f"{client_address[0]}:{client_address[1]}"
+        return worker
+
+    def disconnect(self, worker):
+        with self.lock:
+            for lease, (mid, owner, _) in list(self.leases.items()):
+                if owner == worker:
+                    print(f"Worker {self.names[worker]} left, requeueing {mid}")
+                    self._requeue(lease)
+
+    def _requeue(self, lease):
+        mid = self.leases.pop(lease)[0]
+        if mid not in self.finished:
+            self.queue.appendleft(mid)
+
+    def dispatch(self, worker, message):
+        kind = message.get("type")
+        with self.lock:
+            if kind == "hello":
+                self.names[worker] = f"{message.get('worker')} ({self.names[worker]})"
+                print(f"Worker {self.names[worker]} connected")
+                return None
+            if kind == "lease":
+                return self._lease(worker)
+            if kind == "heartbeat":
+                entry = self.leases.get(message.get("lease"))
+                if entry is not None:
+                    entry[2] = time.monotonic() + self.lease_seconds
+                return None
+            if kind == "result":
+                return self._complete(message)
+        raise ValueError(f"unknown message type {kind!r}")
+
+    def _lease(self, worker):
+        while self.queue:
+            mid = self.queue.popleft()
+            if mid in self.finished:
+                continue
+            lease = next(self._lease_ids)
+            self.leases[lease] = [mid, worker, time.monotonic() + self.lease_seconds]
+            config1, config2 = self.pairs[mid]
+            return {"type": "match", "lease": lease, "match_id": mid, "config1": config1,
+                    "config2": config2, "num_games": self.num_games,
+                    "heartbeat": self.lease_seconds / 4}
+        if len(self.finished) < len(self.pairs):
+            return {"type": "wait", "seconds": WAIT_SECONDS}
+        return {"type": "done"}
+
+    def _complete(self, message):
+        mid = message["match_id"]
+        self.leases.pop(message.get("lease"), None)
+        if mid not in self.pairs or mid in self.finished:
+            return {"type": "stale"}
+        self.finished.add(mid)
+        # a copy may still be out after an expired lease; its result will
+        # be stale, and no one else should start it meanwhile
+        for lease, (other, _, _) in list(self.leases.items()):
+            if other == mid:
+                del self.leases[lease]
+        self.results.put((mid, message["results"]))
+        return {"type": "ok"}
+
+    def _expire(self):
+        now = time.monotonic()
+        with self.lock:
+            for lease, (mid, worker, deadline) in list(self.leases.items()):
+                if deadline < now:
+                    print(f"Lease {lease} of {self.names[worker]} expired, requeueing {mid}")
+                    self._requeue(lease)
+
+    def run(self):
+        """Serve workers until every pending match is recorded"""
+        host, port = self.address
+        print(f"Coordinator listening on {host}:{port}, {len(self.pairs)} matches to hand out")
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            recorded = 0
+            while recorded < len(self.pairs):
+                self._expire()
+                try:
+                    mid, results = self.results.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                config1, config2 = self.pairs[mid]
+                self.tournament.record_match(self.all_results, self.total_matches, config1, config2, results)
+                recorded += 1
+            # answer the workers' last lease requests with "done"
+            time.sleep(2 * WAIT_SECONDS)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+        return self.all_results
+
+
+def run_worker(address, name=None, connect_seconds=CONNECT_SECONDS):
+    """Play matches for the coordinator at `address` until it is done.
+
+    Returns the number of matches played.
+    """
+    name = name or socket.gethostname()
+    deadline = time.monotonic() + connect_seconds
+    while True:
+        try:
+            sock = socket.create_connection(address)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1.0)
+    tournament = AITournament()
+    played = 0
+    send_lock = threading.Lock()
+
+    def post(message):
+        with send_lock:
+            send(sock, message)
+
+    with sock, sock.makefile("rb") as reader:
+        try:
+            played = _serve_leases(tournament, name, post, reader)
+        except ConnectionError:
+            pass  # the coordinator finished and closed the connection
+    print(f"{name}: coordinator done, played {played} matches")
+    return played
+
+
+def _serve_leases(tournament, name, post, reader):
+    played = 0
+    post({"type": "hello", "worker": name})
+    while True:
+        post({"type": "lease"})
+        reply = receive(reader)
+        if reply is None or reply["type"] == "done":
+            break
+        if reply["type"] == "wait":
+            time.sleep(reply["seconds"])
+            continue
+        config1, config2 = reply["config1"], reply["config2"]
+        # JSON turned the start positions into lists
+        for config in (config1, config2):
+            if "start_pos" in config:
+                config["start_pos"] = tuple(config["start_pos"])
+        print(f"{name}: playing {reply['match_id']}")
+
+        stop = threading.Event()
+
+        def heartbeat(lease=reply["lease"], interval=reply["heartbeat"]):
+            while not stop.wait(interval):
+                try:
+                    post({"type": "heartbeat", "lease": lease})
+                except OSError:
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            results = tournament.run_match(config1, config2, num_games=reply["num_games"])
+        finally:
+            stop.set()
+            beat.join()
+        post({"type": "result", "lease": reply["lease"], "match_id": reply["match_id"],
+              "results": results})
+        if receive(reader) is None:
+            break
+        played += 1
+    return played
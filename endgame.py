@@ -0,0 +1,129 @@
+"""Exact solver for positions where the two pawns can no longer meet.
+
+Once blackouts split the free cells so that the pawns sit in different
+regions, a 'legal' mode game falls apart into two independent subgames.
+In each one a single pawn walks around its own region.  After every one
+of its moves the other player blacks out two of its new neighbours, or
+all of them when there are two or fewer.  A player's own moves and
+blackouts never reach the other region.
+
+So each region has a survival length: how many more moves its pawn can
+make against the best blackouts.  The player to move, A, makes its k-th
+move before the opponent B makes its k-th move.  A therefore wins exactly
+when A survives longer than B.
+"""
+from functools import lru_cache
+
+from bitboard import bit_list, neighbour_masks, popcount
+
+DEFAULT_MEMO_ENTRIES = 500_000
+
+
+@lru_cache(maxsize=None)
+def _row_masks(size):
+    # cells not on the first row (y == 0) and not on the last row
+    not_first = not_last = 0
+    for x in range(size):
+        for y in range(size):
+            bit = 1 << (x * size + y)
+            if y != 0:
+                not_first |= bit
+            if y != size - 1:
+                not_last |= bit
+    return not_first, not_last, (1 << size * size) - 1
+
+
+def dilate(mask, size):
+    """``mask`` plus every cell one king step away from it."""
+    not_first, not_last, full = _row_masks(size)
+    # cells are numbered x * size + y, so y +/- 1 is a shift by one that must
+    # not wrap into the next column, and x +/- 1 is a shift by size
+    column = mask | ((mask << 1) & not_first) | ((mask >> 1) & not_last)
+    return (column | (column << size) | (column >> size)) & full
+
+
+def flood_fill(seed, free, size):
+    """Cells of ``free`` connected to the ``seed`` cells by king steps."""
+    region = seed & free
+    while True:
+        grown = dilate(region, size) & free
+        if grown == region:
+            return region
+        region = grown
+
+
+class EndgameSolver:
+    """Memoized survival lengths, keyed by region bitmask and pawn cell."""
+
+    def __init__(self, size, max_entries=DEFAULT_MEMO_ENTRIES):
+        self.size = size
+        self.near = neighbour_masks(size, 1)
+        self.max_entries = max_entries
+        self.memo = {}
+        self.solved = 0
+        # memo keys pack region, pawn cell and to_move into one int; the
+        # pawn field must hold every cell index of the board
+        self._region_shift = (size * size).bit_length() + 1
+
+    def regions(self, free, pawn1, pawn2):
+        """The two pawns' regions, or None while they can still meet.
+
+        ``free`` holds the empty cells and both pawn cells.
+        """
+        region1 = flood_fill(1 << pawn1, free, self.size)
+        if region1 >> pawn2 & 1:
+            return None
+        return region1, flood_fill(1 << pawn2, free, self.size)
+
+    def survival(self, region, pawn, to_move=True):
+        """Moves the pawn can still make inside ``region`` (its own cell
+        included), with the pawn to move or, with to_move=False, right
+        before the opponent's blackouts."""
+        key = region << self._region_shift | pawn << 1 | to_move
+        value = self.memo.get(key)
+        if value is not None:
+            return value
+        near = self.near[pawn] & region
+        if to_move:
+            value = 0
+            # every move but the last is followed by two blackouts
+            bound = (popcount(region) - 1) // 2 + 1
+            for cell in bit_list(near):
+                value = max(value, 1 + self.survival(region, cell, False))
+                if value >= bound:
+                    break
+        else:
+            cells = bit_list(near)
+            if len(cells) <= 2:
+                value = 0
+            else:
+                value = None
+                for i, a in enumerate(cells):
+                    for b in cells[i + 1:]:
+                        v = self.survival(region & ~(1 << a | 1 << b), pawn, True)
+                        if value is None or v < value:
+                            value = v
+                            if value == 0:
+                                break
+                    if value == 0:
+                        break
+        if len(self.memo) >= self.max_entries:
+            self.memo.clear()
+        self.memo[key] = value
+        return value
+
+    def solve(self, free, pawns, player):
+        """``(winner, plies)`` for ``player`` to move, or None while the
+        pawns share a region.  ``plies`` is the number of plies until the
+        loser has no move left."""
+        opponent = 1 if player == 2 else 2
+        regions = self.regions(free, pawns[player], pawns[opponent])
+        if regions is None:
+            return None
+        own, other = regions
+        self.solved += 1
+        mine = self.survival(own, pawns[player], True)
+        theirs = self.survival(other, pawns[opponent], False)
+        if mine > theirs:
+            return player, 2 * theirs + 1
+        return opponent, 2 * mine
@@ -0,0 +1,136 @@
+"""Load generator for engine_server.
+
+Opens --clients connections to a running server, each sending --requests
+search requests one after the other, and reports the latency percentiles
+and the requests per second over all of them.  Positions are drawn from
+--positions random positions, so that with fewer positions than requests
+the position cache is exercised too.
+
+    python cli.py serve --port 5556 --workers 4 &
+    python engine_load.py --port 5556 --clients 16 --requests 50 --depth 3
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from game import PLAYER1, PLAYER2, Game, opposite
+
+
+def random_positions(count, seed=0, max_plies=12):
+    """Requests for `count` positions reached by random play from random starts"""
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(8) for y in range(8)]
+    positions = []
+    while len(positions) < count:
+        game = Game(mode='AI vs AI', first_player=PLAYER1, tt_bytes=0)
+        start1, start2 = rng.sample(cells, 2)
+        game.place_pawn(PLAYER1, start1)
+        game.place_pawn(PLAYER2, start2)
+        blackouts = []
+        player = PLAYER1
+        for _ in range(rng.randrange(max_plies)):
+            moves = game.get_legal_moves(player)
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves), player)
+            player = opposite(player)
+            targets = game.get_legal_moves(player)
+            blacks = rng.sample(targets, min(2, len(targets)))
+            game.apply_blackouts(blacks)
+            blackouts += blacks
+        if not game.get_legal_moves(player):
+            continue
+        positions.append({
+            "position": {"p1": game.get_pawn_position(PLAYER1), "p2": game.get_pawn_position(PLAYER2),
+                         "blackouts": blackouts},
+            "player": player,
+        })
+    return positions
+
+
+async def run_client(host, port, requests, limits, rng, positions, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(requests):
+            request = {"id": i, **rng.choice(positions), **limits}
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if "error" in response:
+                errors.append(response["error"])
+    finally:
+        writer.close()
+
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"type": "stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+async def run_load(host, port, clients, requests, limits, positions, seed=0):
+    rng = random.Random(seed)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, requests, limits, random.Random(rng.random()),
+                                      positions, latencies, errors)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentiles[49] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "server": await server_stats(host, port),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running engine server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5556)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=25, help="requests per client (default: %(default)s)")
+    parser.add_argument("--positions", type=int, default=50,
+                        help="distinct positions to draw from (default: %(default)s)")
+    parser.add_argument("--depth", type=int, help="search depth (default: the server's)")
+    parser.add_argument("--time", type=float, help="seconds per search instead of a fixed depth")
+    parser.add_argument("--search", help="search algorithm")
+    parser.add_argument("--evaluation", help="evaluation function")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    limits = {key: value for key, value in (("depth", args.depth), ("time", args.time),
+                                            ("search", args.search), ("evaluation", args.evaluation))
+              if value is not None}
+    positions = random_positions(args.positions, args.seed)
+    result = asyncio.run(run_load(args.host, args.port, args.clients, args.requests, limits, positions,
+                                  args.seed))
+    print(f"{result['requests']} requests from {result['clients']} clients in {result['seconds']:.2f}s: "
+          f"{result['requests_per_sec']:.1f} requests/s")
+    print(f"latency: p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+          f"mean {result['mean_ms']:.1f} ms")
+    server = result["server"]
+    print(f"server: {server['searches']} searches, {server['cache_hits']} cache hits, "
+          f"{server['shared']} shared, {server['errors']} errors")
+    if result["errors"]:
+        print(f"{result['errors']} requests failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
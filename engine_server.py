@@ -0,0 +1,392 @@
+"""Asyncio engine server: best actions for many clients at once.
+
+Clients send requests and get responses as JSON Lines, over TCP or over
+stdin/stdout, so front-ends and bots share one set of warm engines instead
+of starting a Python process per move:
+
+    python cli.py serve --port 5556 --workers 4
+    python cli.py serve --stdio
+
+A search request names a position, the player to move and a depth or a
+time limit (seconds of iterative deepening, capped at "depth" if given):
+
+    {"id": 1, "position": {"p1": [0, 2], "p2": [7, 5], "blackouts": [[3, 3]],
+     "size": 8, "mode": "legal"}, "player": 2, "depth": 3,
+     "search": "pvs", "evaluation": "area"}
+
+and is answered, in any order, with
+
+    {"id": 1, "move": [6, 4], "blackouts": [[1, 2], [1, 3]], "depth": 3,
+     "nodes": 1234, "seconds": 0.05, "cached": false}
+
+"move" is null when the player cannot move; a request that fails gets
+{"id", "error"}.  {"type": "cancel", "id"} cancels a request, which is
+then answered with {"id", "error": "cancelled"}; {"type": "stats"} returns
+the server counters.
+
+Searches run on a process pool with one search per process at a time,
+each process keeping a Game, with its transposition tables, per board
+size, blackout mode and evaluation between requests.  Boards are at most
+BOARD_SIZE wide.
+Requests wait in a bounded queue; while it is full the server stops
+reading from the connection that is adding to it.  Finished results are
+cached by position and limits (cleared when full), and concurrent
+requests for the same search share one run.  A running search is stopped
+through a shared flag that a thread of its worker process turns into
+Game.cancel.
+"""
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import cell_bits, cell_index
+from game import BOARD_SIZE, EVALUATIONS, PLAYER1, PLAYER2, SEARCHES, Game, SearchTimeout
+
+DEFAULT_DEPTH = 3
+MIN_SIZE = 3
+MAX_SIZE = BOARD_SIZE
+MAX_DEPTH = 6
+MAX_SECONDS = 30.0
+DEFAULT_QUEUE = 64
+DEFAULT_CACHE_ENTRIES = 100_000
+# seconds between checks of the cancel flags in a worker process
+CANCEL_POLL = 0.01
+
+# worker process state: the cancel flags of all slots, this process'
+# Games by (size, blackout mode, evaluation), since table entries of one
+# are wrong in another, the Game searching and the slot of its search
+_flags = None
+_games = {}
+_game = None
+_slot = None
+
+
+def _init_worker(flags):
+    global _flags
+    _flags = flags
+    threading.Thread(target=_watch_cancel, daemon=True).start()
+
+
+def _watch_cancel():
+    while True:
+        time.sleep(CANCEL_POLL)
+        slot, game = _slot, _game
+        if slot is not None and game is not None and _flags[slot]:
+            game.cancel()
+
+
+def _search(slot, state, player, depth, seconds, search, evaluation):
+    # runs in a worker process; None when the search was cancelled
+    global _game, _slot
+    size, blackout_mode = state[:2]
+    game = _games.get((size, blackout_mode, evaluation))
+    if game is None:
+        game = Game.from_state(state)
+        game.collect_stats = True
+        game.evaluation = evaluation
+        _games[size, blackout_mode, evaluation] = game
+    else:
+        game.set_state(state)
+    game.search = search
+    game._cancelled = False
+    _game = game
+    _slot = slot
+    start = time.perf_counter()
+    try:
+        if seconds:
+            action = game.best_action_within(player, seconds, depth)
+            depth = game.last_depth
+        else:
+            action = game.best_action_for(player, depth)
+    except SearchTimeout:
+        return None
+    finally:
+        _slot = None
+    if _flags[slot]:
+        return None
+    stats = game.last_stats
+    move, blacks = action if action is not None else (None, [])
+    return {"move": move, "blackouts": blacks, "depth": depth,
+            "nodes": stats.nodes if stats is not None else 0,
+            "seconds": time.perf_counter() - start}
+
+
+def position_state(position, player):
+    """Game.state() of a request's position with `player` to move"""
+    size = position.get("size", BOARD_SIZE)
+    # a Game of a large board takes long to build and to search
+    if type(size) is not int or not MIN_SIZE <= size <= MAX_SIZE:
+        raise ValueError(f"size must be between {MIN_SIZE} and {MAX_SIZE}")
+    mode = position.get("mode", "legal")
+    if mode not in ("legal", "distant"):
+        raise ValueError(f"unknown blackout mode {mode!r}")
+    if player not in (PLAYER1, PLAYER2):
+        raise ValueError(f"player must be {PLAYER1} or {PLAYER2}")
+
+    def index(cell):
+        x, y = cell
+        if not (0 <= x < size and 0 <= y < size):
+            raise ValueError(f"cell {cell} is off the {size}x{size} board")
+        return cell_index(x, y, size)
+
+    bits = cell_bits(size)
+    pawn1, pawn2 = index(position["p1"]), index(position["p2"])
+    if pawn1 == pawn2:
+        raise ValueError("both pawns on one cell")
+    blocked = bits[pawn1] | bits[pawn2]
+    for cell in position.get("blackouts", ()):
+        blocked |= bits[index(cell)]
+    return size, mode, player, blocked, pawn1, pawn2
+
+
+def _feed_stdin(loop, reader):
+    for line in sys.stdin.buffer:
+        loop.call_soon_threadsafe(reader.feed_data, line)
+    loop.call_soon_threadsafe(reader.feed_eof)
+
+
+class _StdoutWriter:
+    # the part of asyncio.StreamWriter that handle uses
+
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Job:
+    # one search, shared by every request for the same key
+    __slots__ = ('key', 'future', 'waiters', 'slot', 'cancelled')
+
+    def __init__(self, key, future):
+        # the key is the argument tuple of _search after the slot
+        self.key = key
+        self.future = future
+        self.waiters = 0
+        self.slot = None
+        self.cancelled = False
+
+
+class EngineServer:
+    """Search requests from any number of connections on a process pool."""
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE, cache_entries=DEFAULT_CACHE_ENTRIES,
+                 max_depth=MAX_DEPTH, max_seconds=MAX_SECONDS):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.cache_entries = cache_entries
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.cache = {}
+        # key -> _Job of the searches queued or running
+        self.running = {}
+        self.counters = {"requests": 0, "cache_hits": 0, "shared": 0, "searches": 0,
+                         "cancelled": 0, "errors": 0}
+        self._queue = None
+        self._pool = None
+        self._flags = None
+        self._consumers = []
+
+    async def start(self):
+        self._flags = mp.Array('b', self.workers, lock=False)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self._flags,))
+        self._queue = asyncio.Queue(self.queue_size)
+        self._consumers = [asyncio.create_task(self._consume(slot)) for slot in range(self.workers)]
+
+    async def close(self):
+        for task in self._consumers:
+            task.cancel()
+        for slot in range(self.workers):
+            self._flags[slot] = 1
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    async def serve_tcp(self, host="127.0.0.1", port=5556):
+        await self.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Engine server listening on {address[0]}:{address[1]} with {self.workers} workers",
+              file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def serve_stdio(self):
+        await self.start()
+        # stdin and stdout may be files as well as pipes, which asyncio
+        # pipe transports refuse: a thread reads, writes block
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        threading.Thread(target=_feed_stdin, args=(loop, reader), daemon=True).start()
+        try:
+            await self.handle(reader, _StdoutWriter(), finish=True)
+        finally:
+            await self.close()
+
+    async def handle(self, reader, writer, finish=False):
+        """Serve one connection until it closes; its open requests are
+        cancelled then, or answered first with finish=True (stdin at EOF)"""
+        lock = asyncio.Lock()
+        # request id -> task waiting for its search
+        pending = {}
+
+        async def send(message):
+            async with lock:
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message.get("type", "search")
+                except (ValueError, AttributeError):
+                    await send({"error": "requests are JSON objects, one per line"})
+                    continue
+                if kind == "cancel":
+                    task = pending.get(message.get("id"))
+                    if task is not None:
+                        task.cancel()
+                elif kind == "stats":
+                    await send({"id": message.get("id"), **self.stats()})
+                elif kind == "search":
+                    await self._request(message, send, pending)
+                else:
+                    await send({"id": message.get("id"), "error": f"unknown request type {kind!r}"})
+            if finish and pending:
+                await asyncio.wait(list(pending.values()))
+        except ConnectionError:
+            pass
+        finally:
+            for task in list(pending.values()):
+                task.cancel()
+            writer.close()
+
+    def stats(self):
+        return {**self.counters, "queued": self._queue.qsize(),
+                "running": sum(job.slot is not None for job in self.running.values()),
+                "cached": len(self.cache), "workers": self.workers}
+
+    def _parse(self, message):
+        depth = message.get("depth")
+        seconds = message.get("time")
+        if depth is None and not seconds:
+            depth = DEFAULT_DEPTH
+        # a fractional depth would search to the end of the game
+        if depth is not None and (type(depth) is not int or not 1 <= depth <= self.max_depth):
+            raise ValueError(f"depth must be an integer between 1 and {self.max_depth}")
+        if seconds and not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"time must be at most {self.max_seconds} seconds")
+        search = message.get("search", "alphabeta")
+        if search not in SEARCHES:
+            raise ValueError(f"unknown search {search!r}, expected one of {SEARCHES}")
+        evaluation = message.get("evaluation", "mobility")
+        if evaluation not in EVALUATIONS:
+            raise ValueError(f"unknown evaluation {evaluation!r}, expected one of {EVALUATIONS}")
+        player = message.get("player", PLAYER2)
+        state = position_state(message["position"], player)
+        return state, player, depth, seconds or None, search, evaluation
+
+    async def _request(self, message, send, pending):
+        request_id = message.get("id")
+        self.counters["requests"] += 1
+        try:
+            # the search arguments are also the cache key
+            key = self._parse(message)
+        except (KeyError, TypeError, ValueError) as e:
+            self.counters["errors"] += 1
+            await send({"id": request_id, "error": f"bad request: {e}"})
+            return
+        result = self.cache.get(key)
+        if result is not None:
+            self.counters["cache_hits"] += 1
+            await send({"id": request_id, **result, "cached": True})
+            return
+        job = self.running.get(key)
+        if job is None:
+            job = _Job(key, asyncio.get_running_loop().create_future())
+            self.running[key] = job
+            # waits while the queue is full, so no more lines are read from
+            # this connection meanwhile
+            await self._queue.put(job)
+        else:
+            self.counters["shared"] += 1
+        job.waiters += 1
+        task = asyncio.create_task(self._answer(request_id, job, send))
+        pending[request_id] = task
+        task.add_done_callback(lambda _: pending.pop(request_id, None))
+
+    async def _answer(self, request_id, job, send):
+        try:
+            result = await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.waiters -= 1
+            if job.waiters == 0:
+                self._cancel(job)
+            result = {"error": "cancelled"}
+        try:
+            await send({"id": request_id, **result})
+        except ConnectionError:
+            pass
+
+    def _cancel(self, job):
+        job.cancelled = True
+        if job.slot is not None:
+            self._flags[job.slot] = 1
+        self._finish(job, {"error": "cancelled"})
+        self.counters["cancelled"] += 1
+
+    def _finish(self, job, result):
+        if self.running.get(job.key) is job:
+            del self.running[job.key]
+        if not job.future.done():
+            job.future.set_result(result)
+
+    async def _consume(self, slot):
+        # feeds one worker process, one search at a time
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.cancelled:
+                continue
+            job.slot = slot
+            self._flags[slot] = 0
+            try:
+                result = await loop.run_in_executor(self._pool, _search, slot, *job.key)
+            except Exception as e:
+                self.counters["errors"] += 1
+                self._finish(job, {"error": f"search failed: {e}"})
+                continue
+            finally:
+                job.slot = None
+            self.counters["searches"] += 1
+            if result is None or job.cancelled:
+                self._finish(job, {"error": "cancelled"})
+                continue
+            if len(self.cache) >= self.cache_entries:
+                self.cache.clear()
+            self.cache[job.key] = result
+            self._finish(job, {**result, "cached": False})
+
+
+def serve(host="127.0.0.1", port=5556, stdio=False, **options):
+    server = EngineServer(**options)
+    try:
+        asyncio.run(server.serve_stdio() if stdio else server.serve_tcp(host, port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,103 @@
+"""Territory evaluation for Game searches with evaluation='area'.
+
+The default evaluation is the one-step mobility difference.  This one
+looks further ahead, still on bitboards:
+
+- mobility: free neighbours of each pawn, as before
+- two-step mobility: free cells each pawn reaches in at most two moves
+- territory: a breadth-first search from both pawns at once, a cell
+  belongs to the pawn that reaches it in fewer moves; cells both reach in
+  the same number of moves are contested and go to the player to move,
+  who gets there first
+- area: the size of the region each pawn can still walk to at all, which
+  only differs once blackouts have split the board
+
+Scores are integers from PLAYER2's side, far below game.PROVEN_SCORE, and
+are memoized by position hash in a table that is cleared when full.
+"""
+from bitboard import neighbour_masks, popcount
+from endgame import dilate
+
+WEIGHT_MOBILITY = 4
+WEIGHT_TWO_STEP = 2
+WEIGHT_TERRITORY = 1
+WEIGHT_AREA = 1
+
+DEFAULT_EVAL_ENTRIES = 200_000
+
+
+class AreaEvaluator:
+    """Memoized territory evaluation for one board size."""
+
+    def __init__(self, size, max_entries=DEFAULT_EVAL_ENTRIES):
+        self.size = size
+        self.near = neighbour_masks(size, 1)
+        self.full = (1 << size * size) - 1
+        self.max_entries = max_entries
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def score(self, key, blocked, pawn1, pawn2, player):
+        """Score of a position where `player` (1 or 2) has a move.
+
+        `key` identifies the position and the player to move, e.g.
+        Game.position_key(player).
+        """
+        value = self.memo.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self._score(blocked, pawn1, pawn2, player)
+        if len(self.memo) >= self.max_entries:
+            self.memo.clear()
+        self.memo[key] = value
+        return value
+
+    def _score(self, blocked, pawn1, pawn2, player):
+        size = self.size
+        free = self.full & ~blocked
+        near1 = self.near[pawn1] & free
+        near2 = self.near[pawn2] & free
+
+        # Simultaneous breadth-first search from the pawns' moves.  The
+        # fronts are the cells first reached in the last step; the first
+        # step also gives the two-step mobility.  The pawns share a region
+        # once a front reaches cells the other pawn has reached, otherwise
+        # each one's cells are its whole region.
+        front1, front2 = near1, near2
+        reached1, reached2 = near1, near2
+        mine1 = popcount(near1 & ~near2)
+        mine2 = popcount(near2 & ~near1)
+        shared = popcount(near1 & near2)
+        apart = not shared
+        two1 = two2 = None
+        while front1 | front2:
+            grown1 = dilate(front1, size) & free
+            grown2 = dilate(front2, size) & free
+            if two1 is None:
+                two1, two2 = near1 | grown1, near2 | grown2
+            if apart and (grown1 & (reached2 | grown2) or grown2 & reached1):
+                apart = False
+            claimed = reached1 | reached2
+            front1 = grown1 & ~claimed
+            front2 = grown2 & ~claimed
+            both = front1 & front2
+            mine1 += popcount(front1 & ~both)
+            mine2 += popcount(front2 & ~both)
+            shared += popcount(both)
+            reached1 |= front1
+            reached2 |= front2
+        if two1 is None:
+            two1, two2 = near1, near2
+        if player == 2:
+            mine2 += shared
+        else:
+            mine1 += shared
+
+        area = mine2 - mine1 if apart else 0
+        return (WEIGHT_MOBILITY * (popcount(near2) - popcount(near1))
+                + WEIGHT_TWO_STEP * (popcount(two2) - popcount(two1))
+                + WEIGHT_TERRITORY * (mine2 - mine1)
+                + WEIGHT_AREA * area)
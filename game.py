@@ -1,234 +1,995 @@
 import itertools
 import math
+import sys
+import time
+from collections import defaultdict
+
+from endgame import EndgameSolver
+from evaluation import AreaEvaluator
+from search_stats import SearchStats
+from bitboard import (bit_list, cell_bits, cell_coords, cell_index, inverse_symmetry_maps,
+                      neighbour_masks, popcount, symmetry_maps, transform_mask)
+from transposition import (DEFAULT_TT_BYTES, EXACT, LANE_MASK, LOWER, UPPER, TranspositionTable,
+                           canonical_lane, zobrist_keys)
 
 BOARD_SIZE = 8
 
 EMPTY   = 0
-PLAYER1 = 1   # human 
-PLAYER2 = 2   # AI 
+PLAYER1 = 1   # human
+PLAYER2 = 2   # AI
 BLACKOUT = 3
 
+# shallowest remaining depth at which minimax probes and fills the table
+TT_MIN_DEPTH = 2
+
+# Scores of positions the endgame solver has proven are WIN_SCORE minus the
+# number of plies to the end (negated for PLAYER1 wins); anything at or
+# beyond PROVEN_SCORE is decided. Mobility evaluations stay far below it.
+WIN_SCORE = 1_000_000
+PROVEN_SCORE = WIN_SCORE - 10_000
+# the solver is asked at nodes with this much depth left, once both pawns'
+# regions are at most ENDGAME_MAX_REGION cells
+ENDGAME_MIN_DEPTH = 2
+ENDGAME_MAX_REGION = 14
+# killer actions kept per remaining search depth
+KILLERS_PER_DEPTH = 2
+# Game.search: plain alpha-beta, or principal variation search, which also
+# wraps the iterations of best_action_within in aspiration windows of
+# +-ASPIRATION_WINDOW around the previous iteration's score
+SEARCHES = ('alphabeta', 'pvs')
+ASPIRATION_WINDOW = 4
+# Game.evaluation: the one-step mobility difference, or the territory
+# evaluation of evaluation.AreaEvaluator
+EVALUATIONS = ('mobility', 'area')
+
+
+def distant_radii(depth):
+    """(mover's radius, opponent's radius) of the cells that can still
+    matter after the mover's action at a node `depth` plies from the
+    horizon in 'distant' mode, in king steps from the pawns' cells.
+
+    In the depth - 1 plies left the opponent moves (depth // 2) times and
+    the mover (depth - 1) // 2 times.  A pawn's cells are then those it
+    walks to plus one step for the evaluation, or plus two when the other
+    player still blacks out cells around it afterwards.
+    """
+    rest = depth - 1
+    other_moves, own_moves = (rest + 1) // 2, rest // 2
+    own_radius = own_moves + (2 if other_moves else 1)
+    other_radius = other_moves + (2 if own_moves else 1)
+    return own_radius, other_radius
+
 
 def opposite(player):
     return PLAYER1 if player == PLAYER2 else PLAYER2
 
 
+def is_decided(score):
+    return score in (-math.inf, math.inf) or abs(score) >= PROVEN_SCORE
+
+
+def _below(score):
+    # largest score strictly below `score` (scores are integers or +-inf)
+    if score == math.inf:
+        return sys.float_info.max
+    return score - 1
+
+
+def _above(score):
+    if score == -math.inf:
+        return -sys.float_info.max
+    return score + 1
+
+
+def _check_depth(depth, name="depth"):
+    # a fractional depth never reaches the horizon at 0 and searches to the
+    # end of the game, without the checks for timeouts and cancels
+    if type(depth) is not int or depth < 1:
+        raise ValueError(f"{name} must be a positive integer, not {depth!r}")
+
+
+def _root_window(maximizing, alpha, beta, best_index, index):
+    # search window for root action `index` given the best action so far, or
+    # None when the action can no longer become the best one
+    if best_index is None:
+        return alpha, beta
+    if index < best_index:
+        # an equal score would win the tie, so it has to come back exact
+        if maximizing:
+            alpha = _below(alpha)
+        else:
+            beta = _above(beta)
+    if beta <= alpha:
+        return None
+    return alpha, beta
+
+
+def _improves(maximizing, score, index, best, best_index):
+    if best_index is None or score == best and index < best_index:
+        return True
+    return score > best if maximizing else score < best
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget of a move runs out,
+    or when another thread cancels the search."""
+
+
+class _BoardRow:
+    # one row of Game.board, reads and writes go straight to the bitboard
+    __slots__ = ('_game', '_y')
+
+    def __init__(self, game, y):
+        self._game = game
+        self._y = y
+
+    def __getitem__(self, x):
+        if isinstance(x, slice):
+            return list(self)[x]
+        return self._game.cell((x, self._y))
+
+    def __setitem__(self, x, value):
+        self._game.set_cell((x, self._y), value)
+
+    def __len__(self):
+        return self._game.size
+
+    def __iter__(self):
+        return (self._game.cell((x, self._y)) for x in range(self._game.size))
+
+
+class _BoardView:
+    # list-of-rows view kept so that game.board[y][x] still works
+    __slots__ = ('_rows',)
+
+    def __init__(self, game):
+        self._rows = [_BoardRow(game, y) for y in range(game.size)]
+
+    def __getitem__(self, y):
+        return self._rows[y]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
 class Game:
-    def __init__(self, mode='vs AI', first_player=1, blackout_mode='legal'):
+    def __init__(self, mode='vs AI', first_player=1, blackout_mode='legal', size=BOARD_SIZE,
+                 tt_bytes=DEFAULT_TT_BYTES, symmetry=True, collect_stats=False, search='alphabeta',
+                 evaluation='mobility'):
         self.mode = mode
         self.first_player = first_player
         self.current_player = first_player
+        self.size = size
+
+        # bitboard state: every non-empty cell (pawns and blackouts) is set in
+        # `blocked`, pawns[player] is the cell index of that player's pawn
+        self.blocked = 0
+        self.pawns = [None, None, None]
+        # make/unmake undo stack, see _make_move/_make_blackouts/_unmake
+        self._undo = []
+        self._bits = cell_bits(size)
+        self._near = neighbour_masks(size, 1)
+        self._far = neighbour_masks(size, 2)
+        # _reach[r][i]: cells within r king steps of cell i (r < size)
+        self._reach = tuple(neighbour_masks(size, r) for r in range(size))
+
+        # Zobrist hash of blocked cells and pawns, kept up to date by make/unmake.
+        # It holds one 64-bit lane per board symmetry (transposition.LANES);
+        # lane 0 is the hash of the position as it stands.
+        self._zobrist = zobrist_keys(size)
+        self._move_keys = (None,) + tuple(
+            tuple(b ^ p for b, p in zip(self._zobrist.packed_blocked, self._zobrist.packed_pawn[player]))
+            for player in (PLAYER1, PLAYER2))
+        self.hash = 0
+        # key the transposition tables on the canonical form of a position, so
+        # that its 8 rotations and reflections share one entry
+        self.symmetry = symmetry
+        self._symmetries = symmetry_maps(size)
+        self._inverse_symmetries = inverse_symmetry_maps(size)
+
+        # one transposition table per side so that players searching at
+        # different depths never share results; tt_bytes=0 disables them
+        if tt_bytes:
+            self.tt = [None, TranspositionTable(tt_bytes // 2), TranspositionTable(tt_bytes // 2)]
+        else:
+            self.tt = None
+        self._tt = None
+        # wall-clock deadline of the running search, checked by _minimax,
+        # and the cancel flag that another thread may raise (see cancel)
+        self._deadline = None
+        self._cancelled = False
+        self.last_depth = 0
+        if search not in SEARCHES:
+            raise ValueError(f"unknown search {search!r}, expected one of {SEARCHES}")
+        self.search = search
+        if evaluation not in EVALUATIONS:
+            raise ValueError(f"unknown evaluation {evaluation!r}, expected one of {EVALUATIONS}")
+        self._evaluation = evaluation
+        # memoized AreaEvaluator, made on first use
+        self._area = None
+        # opt-in search statistics: while a search runs self.stats is its
+        # SearchStats, afterwards it is kept in self.last_stats
+        self.collect_stats = collect_stats
+        self.stats = None
+        self.last_stats = None
+
+        # exact solver for 'legal' mode positions split into two regions
+        self.endgame = EndgameSolver(size)
+
+        # move ordering tables (see _order_moves): up to KILLERS_PER_DEPTH
+        # cutoff actions per remaining depth, and history scores per player
+        # for pawn destinations and for blacked out cells
+        self._killers = defaultdict(list)
+        self._move_history = [None] + [[0] * (size * size) for _ in (PLAYER1, PLAYER2)]
+        self._black_history = [None] + [[0] * (size * size) for _ in (PLAYER1, PLAYER2)]
+        # the evaluation each player's table and history scores were filled with
+        self._table_evaluations = [None, evaluation, evaluation]
+        self._full = (1 << size * size) - 1
+
+        self.board = _BoardView(self)
 
-        
-        self.board = [[EMPTY] * BOARD_SIZE for _ in range(BOARD_SIZE)]
         # Default starting positions:
         self.board[2][0] = PLAYER1
-        self.board[5][7] = PLAYER2
+        self.board[size - 3][size - 1] = PLAYER2
 
         # legal (adjacent empty cells only) or distant (up to two squares away)
+        self._blackout_mode = blackout_mode
+
+    @property
+    def blackout_mode(self):
+        return self._blackout_mode
+
+    @blackout_mode.setter
+    def blackout_mode(self, blackout_mode):
+        # table entries of one mode are wrong in the other, see _clear_tables
+        if blackout_mode != self._blackout_mode:
+            self._clear_tables()
+        self._blackout_mode = blackout_mode
+
+    @property
+    def evaluation(self):
+        return self._evaluation
+
+    @evaluation.setter
+    def evaluation(self, evaluation):
+        # the tables of a side are cleared when it next searches with a
+        # different evaluation, see _select_table
+        if evaluation not in EVALUATIONS:
+            raise ValueError(f"unknown evaluation {evaluation!r}, expected one of {EVALUATIONS}")
+        self._evaluation = evaluation
+
+    def _clear_tables(self):
+        # drop everything learnt by earlier searches: the transposition
+        # tables, killers and history scores
+        if self.tt is not None:
+            for table in self.tt[1:]:
+                table.clear()
+        self._killers.clear()
+        for table in self._move_history[1:] + self._black_history[1:]:
+            table[:] = [0] * len(table)
+
+    def state(self):
+
+        # picklable snapshot of the position, see from_state
+        return (self.size, self.blackout_mode, self.current_player, self.blocked,
+                self.pawns[PLAYER1], self.pawns[PLAYER2])
+
+    @classmethod
+    def from_state(cls, state, tt_bytes=DEFAULT_TT_BYTES):
+
+        size, blackout_mode, current_player = state[:3]
+        game = cls(mode='AI vs AI', first_player=current_player,
+                   blackout_mode=blackout_mode, size=size, tt_bytes=tt_bytes)
+        game.set_state(state)
+        return game
+
+    def set_state(self, state):
+
+        # load a position of the same board size, keeping the tables unless
+        # the blackout mode changes
+        size, blackout_mode, current_player, blocked, pawn1, pawn2 = state
+        if size != self.size:
+            raise ValueError(f"state is for a {size}x{size} board, not {self.size}x{self.size}")
         self.blackout_mode = blackout_mode
+        self.current_player = current_player
+        self.blocked = blocked
+        self.pawns[PLAYER1] = pawn1
+        self.pawns[PLAYER2] = pawn2
+        self.hash = self._compute_hash()
+        self._undo.clear()
+
+    def _index(self, pos):
+        x, y = pos
+        return cell_index(x, y, self.size)
+
+    def _coords(self, index):
+        return cell_coords(index, self.size)
+
+    def cell(self, pos):
+
+        index = self._index(pos)
+        if index == self.pawns[PLAYER1]:
+            return PLAYER1
+        if index == self.pawns[PLAYER2]:
+            return PLAYER2
+        if self.blocked & self._bits[index]:
+            return BLACKOUT
+        return EMPTY
+
+    def set_cell(self, pos, value):
+        # placing a pawn moves it; overwriting a pawn removes it from the board
+        # (position setup, not recorded on the undo stack)
+        index = self._index(pos)
+        bit = self._bits[index]
+        for player in (PLAYER1, PLAYER2):
+            if self.pawns[player] == index:
+                self.pawns[player] = None
+        if value in (PLAYER1, PLAYER2):
+            old = self.pawns[value]
+            if old is not None:
+                self.blocked &= ~self._bits[old]
+            self.pawns[value] = index
+        if value == EMPTY:
+            self.blocked &= ~bit
+        else:
+            self.blocked |= bit
+        self.hash = self._compute_hash()
+
+    def _compute_hash(self):
+        keys = self._zobrist
+        h = 0
+        for index in bit_list(self.blocked):
+            h ^= keys.packed_blocked[index]
+        for player in (PLAYER1, PLAYER2):
+            if self.pawns[player] is not None:
+                h ^= keys.packed_pawn[player][self.pawns[player]]
+        return h
+
+    def position_key(self, player):
+
+        # hash of the position with `player` to move
+        key = self.hash & LANE_MASK
+        return key ^ self._zobrist.side if player == PLAYER2 else key
+
+    def canonical_key(self, player):
+
+        # (key, transform): hash of the canonical form of the position with
+        # `player` to move, the same for all 8 rotations and reflections of it,
+        # and the transform that takes this position onto that form
+        packed = self.hash ^ self._zobrist.packed_side if player == PLAYER2 else self.hash
+        return canonical_lane(packed)
+
+    def canonical_form(self):
+
+        # (state, transform): the position mapped through the transform that
+        # canonical_key picks, as a state() tuple, plus that transform
+        _, transform = self.canonical_key(self.current_player)
+        perm = self._symmetries[transform]
+        state = list(self.state())
+        state[3] = transform_mask(self.blocked, perm)
+        state[4:6] = [None if p is None else perm[p] for p in self.pawns[1:]]
+        return tuple(state), transform
+
+    def transform_action(self, action, transform, inverse=False):
+
+        # map an action in (x, y) coordinates through a board symmetry, or
+        # back through it with inverse=True
+        perms = self._inverse_symmetries if inverse else self._symmetries
+        perm = perms[transform]
+        move, blacks = action
+        return (self._coords(perm[self._index(move)]),
+                tuple(self._coords(perm[self._index(c)]) for c in blacks))
+
+    def place_pawn(self, player, pos):
+
+        self.set_cell(pos, player)
 
     def get_pawn_position(self, player):
-        
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
-                if self.board[y][x] == player:
-                    return (x, y)
-        return None
+
+        index = self.pawns[player]
+        if index is None:
+            return None
+        return self._coords(index)
+
+    def _move_mask(self, player, reach):
+        index = self.pawns[player]
+        if index is None:
+            return 0
+        return reach[index] & ~self.blocked
 
     def get_legal_moves(self, player):
-        
-        pos = self.get_pawn_position(player)
-        if pos is None:
-            return []
-
-        x0, y0 = pos
-        moves = []
-        for dx in (-1, 0, 1):
-            for dy in (-1, 0, 1):
-                if dx == 0 and dy == 0:
-                    continue
-                x, y = x0 + dx, y0 + dy
-                if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and self.board[y][x] == EMPTY:
-                    moves.append((x, y))
-        return moves
+
+        return [self._coords(i) for i in bit_list(self._move_mask(player, self._near))]
 
     def get_distant_moves(self, player):
-        
-        pos = self.get_pawn_position(player)
-        if pos is None:
-            return []
-
-        x0, y0 = pos
-        moves = []
-        for dx in range(-2, 3):
-            for dy in range(-2, 3):
-                if dx == 0 and dy == 0:
-                    continue
-                x, y = x0 + dx, y0 + dy
-                if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and self.board[y][x] == EMPTY:
-                    moves.append((x, y))
-        return moves
+
+        return [self._coords(i) for i in bit_list(self._move_mask(player, self._far))]
+
+    def mobility(self, player):
+
+        return popcount(self._move_mask(player, self._near))
+
+    # Make/unmake. Every change to the position during play or search goes
+    # through these and pushes one int on self._undo:
+    #   move:      old pawn cell << 2 | player
+    #   blackouts: mask of the newly blocked cells << 2
+    # _unmake pops the last record and reverts only the cells it names.
+
+    def _make_move(self, player, index):
+        old = self.pawns[player]
+        keys = self._move_keys[player]
+        self.blocked ^= self._bits[old] | self._bits[index]
+        self.hash ^= keys[old] ^ keys[index]
+        self.pawns[player] = index
+        self._undo.append(old << 2 | player)
+
+    def _make_blackouts(self, mask):
+        mask &= ~self.blocked
+        self.blocked |= mask
+        self._hash_cells(mask)
+        self._undo.append(mask << 2)
+
+    def _unmake(self):
+        record = self._undo.pop()
+        player = record & 3
+        if player:
+            old = record >> 2
+            index = self.pawns[player]
+            keys = self._move_keys[player]
+            self.blocked ^= self._bits[old] | self._bits[index]
+            self.hash ^= keys[old] ^ keys[index]
+            self.pawns[player] = old
+        else:
+            self.blocked ^= record >> 2
+            self._hash_cells(record >> 2)
+
+    def _hash_cells(self, mask):
+        keys = self._zobrist.packed_blocked
+        h = self.hash
+        for index in bit_list(mask):
+            h ^= keys[index]
+        self.hash = h
 
     def apply_move(self, move, player):
-        
-        x_new, y_new = move
-        pos = self.get_pawn_position(player)
-        if pos is None:
+
+        if self.pawns[player] is None:
             return
-        x_old, y_old = pos
-        self.board[y_old][x_old] = EMPTY
-        self.board[y_new][x_new] = player
+        self._make_move(player, self._index(move))
 
     def apply_blackouts(self, cells):
-        
+
+        mask = 0
         for (x, y) in cells:
-            if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE:
-                self.board[y][x] = BLACKOUT
+            if 0 <= x < self.size and 0 <= y < self.size:
+                mask |= self._bits[self._index((x, y))]
+        self._make_blackouts(mask)
 
-    def is_terminal(self):
-        
-        return not self.get_legal_moves(self.current_player)
+    def undo(self):
 
-    def evaluate(self):
-        
-        if self.is_terminal():
-            
-            if self.current_player == PLAYER2:
-                return -math.inf
-            
-            else:
-                return math.inf
+        # revert the last apply_move or apply_blackouts
+        if self._undo:
+            self._unmake()
 
-        
-        return len(self.get_legal_moves(PLAYER2)) - len(self.get_legal_moves(PLAYER1))
+    def is_terminal(self):
 
-    def minimax(self, depth, alpha, beta, maximizing):
-        
-        # Leaf‐node either depth0 or current player has no moves
-        if depth == 0 or self.is_terminal():
-            return None, self.evaluate()
+        return not self._move_mask(self.current_player, self._near)
+
+    def _evaluate(self, player):
+        # score of the position with `player` to move, from PLAYER2's side
+        near = self._near
+        blocked = self.blocked
+        if not near[self.pawns[player]] & ~blocked:
+            return -math.inf if player == PLAYER2 else math.inf
+        if self.evaluation == 'area':
+            if self._area is None:
+                self._area = AreaEvaluator(self.size)
+            return self._area.score(self.position_key(player), blocked,
+                                    self.pawns[PLAYER1], self.pawns[PLAYER2], player)
+        return (popcount(near[self.pawns[PLAYER2]] & ~blocked)
+                - popcount(near[self.pawns[PLAYER1]] & ~blocked))
 
-        best_action = None
+    def evaluate(self):
 
-        if maximizing:
-            # AI’s turn (PLAYER2)
-            max_eval = -math.inf
-           
-            moves = self.get_legal_moves(PLAYER2)
-            
-            for move in moves:
-                
-                board_backup = [row[:] for row in self.board]
-                cp_backup = self.current_player
-
-               
-                self.apply_move(move, PLAYER2)
-                
-
-                
-                opponent = PLAYER1
-                if self.blackout_mode == 'legal':
-                    human_moves = self.get_legal_moves(opponent)
-                else:  
-                    human_moves = self.get_distant_moves(opponent)
-               
-                if len(human_moves) >= 2:
-                    combos = list(itertools.combinations(human_moves, 2))
-                else:
-                    combos = [tuple(human_moves)]  #blackout all remaining moves 0, 1 or 2
-
-                
-                for blacks in combos:
-                   
-                    board2_backup = [row[:] for row in self.board]
-                  
-                    self.apply_blackouts(blacks)
-                   
-                    self.current_player = PLAYER1
-                    
-                    _, score = self.minimax(depth - 1, alpha, beta, False)
-
-                    self.board = [row[:] for row in board2_backup]
-                    self.current_player = PLAYER2                                  
-                    
-                    if score > max_eval or best_action is None:
-                        max_eval = score
-                        best_action = (move, blacks)
-
-                    
-                    alpha = max(alpha, max_eval)
+        return self._evaluate(self.current_player)
+
+    def _endgame_score(self, player):
+        # exact score once the pawns are in separate, small enough regions
+        free = self._full & ~self.blocked | self._bits[self.pawns[PLAYER1]] | self._bits[self.pawns[PLAYER2]]
+        if popcount(free) > 2 * ENDGAME_MAX_REGION:
+            return None
+        regions = self.endgame.regions(free, self.pawns[PLAYER1], self.pawns[PLAYER2])
+        if regions is None or max(popcount(r) for r in regions) > ENDGAME_MAX_REGION:
+            return None
+        winner, plies = self.endgame.solve(free, self.pawns, player)
+        return WIN_SCORE - plies if winner == PLAYER2 else plies - WIN_SCORE
+
+    def _blackout_targets(self):
+        return self._far if self.blackout_mode == 'distant' else self._near
+
+    def _actions(self, player, targets, depth=None):
+        # (move, blackout cells, blackout mask) for every action of `player`,
+        # moves in board order and blackout pairs in combinations() order;
+        # with a search depth, 'distant' mode pairs are cut to one per
+        # equivalence class (see _distant_cells)
+        bits = self._bits
+        origin = self.pawns[player]
+        other = self.pawns[opposite(player)]
+        blocked = self.blocked
+        reduce = depth is not None and self._reduce_distant()
+        for move in bit_list(self._near[origin] & ~blocked):
+            moved = blocked ^ bits[origin] ^ bits[move]
+            free = targets[other] & ~moved
+            if reduce:
+                free = self._distant_cells(free, depth, move, other)
+            cells = bit_list(free)
+            if len(cells) >= 2:
+                for a, b in itertools.combinations(cells, 2):
+                    yield move, (a, b), bits[a] | bits[b]
+            else:
+                #blackout all remaining moves 0, 1 or 2
+                yield move, tuple(cells), sum(bits[c] for c in cells)
+
+    def _distant_cells(self, free, depth, own, other):
+        # Blackout candidates that can matter `depth` plies from the node
+        # whose player just moved to `own`, under the mobility evaluation
+        # (the area one looks at the whole board).  Over the depth - 1 plies left
+        # each pawn walks at most one cell per move of its own, so a cell can
+        # only be moved to, counted by the evaluation or blacked out again
+        # within distant_radii of the pawns' cells now.  All other cells are
+        # never looked at again: blocking any one of them is worth the same,
+        # so only the first two (in board order, so that root ties still
+        # go to the first action) are kept.
+        own_radius, other_radius = distant_radii(depth)
+        reach = self._reach
+        last = len(reach) - 1
+        relevant = reach[min(own_radius, last)][own] | reach[min(other_radius, last)][other]
+        rest = free & ~relevant
+        free &= relevant
+        for _ in range(2):
+            if rest:
+                low = rest & -rest
+                free |= low
+                rest ^= low
+        return free
+
+    def _reduce_distant(self):
+        return self.blackout_mode == 'distant' and self.evaluation == 'mobility'
+
+    def _minimax(self, depth, alpha, beta, maximizing):
+        player = PLAYER2 if maximizing else PLAYER1
+        opponent = PLAYER1 if maximizing else PLAYER2
+        pawns = self.pawns
+        moves = self._near[pawns[player]] & ~self.blocked
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+
+        # Leaf node: either depth 0 or current player has no moves
+        if depth == 0 or not moves:
+            if stats is not None:
+                stats.leaves += 1
+            return self._evaluate(player)
+
+        if depth >= 2 and (self._cancelled or self._deadline is not None
+                           and time.perf_counter() > self._deadline):
+            raise SearchTimeout()
+
+        if depth >= ENDGAME_MIN_DEPTH and self.blackout_mode == 'legal':
+            proven = self._endgame_score(player)
+            if proven is not None:
+                return proven
+
+        tt = self._tt if depth >= TT_MIN_DEPTH else None
+        tt_move = tt_blacks = None
+        if tt is not None:
+            packed = self.hash ^ self._zobrist.packed_side if maximizing else self.hash
+            if self.symmetry:
+                key, transform = canonical_lane(packed)
+            else:
+                key, transform = packed & LANE_MASK, 0
+            entry = tt.probe(key)
+            if entry is not None:
+                _, tt_depth, flag, tt_score, tt_action = entry
+                if tt_action is not None:
+                    tt_move, tt_blacks = tt_action
+                    if transform:
+                        # stored in the canonical frame, map it back
+                        inverse = self._inverse_symmetries[transform]
+                        tt_move = inverse[tt_move]
+                        tt_blacks = tuple(sorted(inverse[c] for c in tt_blacks))
+                if tt_depth >= depth:
+                    if flag == EXACT:
+                        return tt_score
+                    if flag == LOWER and tt_score > alpha:
+                        alpha = tt_score
+                    elif flag == UPPER and tt_score < beta:
+                        beta = tt_score
                     if beta <= alpha:
-                        break  
-
-                
-                self.board = [row[:] for row in board_backup]
-                self.current_player = cp_backup
+                        return tt_score
+            alpha0, beta0 = alpha, beta
+            best_action = None
+
+        bits = self._bits
+        make_move = self._make_move
+        make_blackouts = self._make_blackouts
+        unmake = self._unmake
+        targets = self._blackout_targets()[pawns[opponent]]
+        distant = self._reduce_distant()
+        # mobility leaves are scored straight from the masks, see below
+        leaves = depth == 1 and self.evaluation == 'mobility'
+        best = -math.inf if maximizing else math.inf
+        pvs = self.search == 'pvs'
+        first_child = True
+        killers = self._killers[depth]
+        move_history = self._move_history[player]
+        black_history = self._black_history[player]
+        move_list = self._order_moves(moves, tt_move, killers, move_history)
+        if stats is not None:
+            stats.expanded += 1
+            stats.moves += len(move_list)
+        for move in move_list:
+            make_move(player, move)
+            free = targets & ~self.blocked
+            if distant:
+                free = self._distant_cells(free, depth, move, pawns[opponent])
+            cells = bit_list(free)
+            if len(cells) > 2:
+                combos = self._blackout_pairs(cells, free, self._near[move], self._near[pawns[opponent]],
+                                              tt_blacks if move == tt_move else None, killers, black_history)
+            else:
+                combos = (tuple(cells),)  #blackout all remaining moves 0, 1 or 2
+            if stats is not None:
+                stats.move_expansions += 1
+                stats.blackout_pairs += max(1, len(cells) * (len(cells) - 1) // 2)
+
+            if leaves:
+                # the children are leaves: score them straight from the masks
+                # instead of making and unmaking each blackout pair
+                blocked = self.blocked
+                near1 = self._near[pawns[PLAYER1]]
+                near2 = self._near[pawns[PLAYER2]]
+                stuck = -math.inf if opponent == PLAYER2 else math.inf
+                near_opp = near2 if opponent == PLAYER2 else near1
+
+            for blacks in combos:
+                mask = 0
+                for c in blacks:
+                    mask |= bits[c]
+                if leaves:
+                    if stats is not None:
+                        stats.nodes += 1
+                        stats.leaves += 1
+                    free = ~(blocked | mask)
+                    if near_opp & free:
+                        score = popcount(near2 & free) - popcount(near1 & free)
+                    else:
+                        score = stuck
+                elif pvs and not first_child:
+                    # PVS: prove with a null window that the child is no
+                    # better than the best so far, search it fully if not
+                    make_blackouts(mask)
+                    if maximizing:
+                        score = self._minimax(depth - 1, alpha, _above(alpha), False)
+                    else:
+                        score = self._minimax(depth - 1, _below(beta), beta, True)
+                    if alpha < score < beta:
+                        if stats is not None:
+                            stats.researches += 1
+                        score = self._minimax(depth - 1, alpha, beta, not maximizing)
+                    unmake()
+                else:
+                    make_blackouts(mask)
+                    score = self._minimax(depth - 1, alpha, beta, not maximizing)
+                    unmake()
+                    first_child = False
+
+                if maximizing:
+                    if score > best:
+                        best = score
+                        if tt is not None:
+                            best_action = (move, blacks)
+                    if best > alpha:
+                        alpha = best
+                else:
+                    if score < best:
+                        best = score
+                        if tt is not None:
+                            best_action = (move, blacks)
+                    if best < beta:
+                        beta = best
                 if beta <= alpha:
-                    break  
-
-            return best_action, max_eval
-
+                    if stats is not None:
+                        stats.cutoff(stats.root_depth - depth)
+                    self._record_cutoff(depth, player, move, blacks)
+                    break
+            unmake()
+            if beta <= alpha:
+                break
+
+        if tt is not None:
+            if best <= alpha0:
+                flag = UPPER
+            elif best >= beta0:
+                flag = LOWER
+            else:
+                flag = EXACT
+            if transform and best_action is not None:
+                perm = self._symmetries[transform]
+                move, blacks = best_action
+                best_action = (perm[move], tuple(sorted(perm[c] for c in blacks)))
+            tt.store(key, depth, flag, best, best_action)
+        return best
+
+    # Move ordering. Inner nodes search the table's action first, then
+    # moves by the mobility they leave the mover, killer moves first among
+    # equals, then by history.  Blackout pairs come from a generator: the
+    # table's pair, the killer pairs of this depth, then the rest in tiers
+    # of how much they cut the opponent's mobility (net of the mover's own
+    # neighbours they block), cells with a better history first.  Killers
+    # and history are filled by the cutoffs of _minimax.
+
+    def _order_moves(self, moves, tt_move, killers, history):
+        near = self._near
+        free = ~self.blocked
+        killer_moves = [move for move, _ in killers]
+        move_list = bit_list(moves)
+        move_list.sort(key=lambda m: (m != tt_move, -popcount(near[m] & free),
+                                      m not in killer_moves, -history[m]))
+        return move_list
+
+    def _blackout_pairs(self, cells, free, own, opp, first, killers, history):
+        bits = self._bits
+        tried = set()
+        for pair in (first, *(blacks for _, blacks in killers)):
+            if (pair is not None and len(pair) == 2 and pair not in tried
+                    and bits[pair[0]] & free and bits[pair[1]] & free):
+                tried.add(pair)
+                yield pair
+        # cells that block 1, 0 or -1 net opponent moves
+        good, even, bad = groups = ([], [], [])
+        for c in sorted(cells, key=lambda c: -history[c]):
+            b = bits[c]
+            groups[(0 if b & opp else 1) + (1 if b & own else 0)].append(c)
+        for pairs in (itertools.combinations(good, 2), itertools.product(good, even),
+                      itertools.combinations(even, 2), itertools.product(good, bad),
+                      itertools.product(even, bad), itertools.combinations(bad, 2)):
+            for a, b in pairs:
+                pair = (a, b) if a < b else (b, a)
+                if pair not in tried:
+                    yield pair
+
+    def _record_cutoff(self, depth, player, move, blacks):
+        killers = self._killers[depth]
+        action = (move, blacks)
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[KILLERS_PER_DEPTH:]
+        bonus = depth * depth
+        self._move_history[player][move] += bonus
+        black_history = self._black_history[player]
+        for c in blacks:
+            black_history[c] += bonus
+
+    def _age_history(self):
+        # halve the history scores at the start of every search so that
+        # the latest positions count most
+        for table in self._move_history[1:] + self._black_history[1:]:
+            for i, value in enumerate(table):
+                table[i] = value >> 1
+
+    def _search_root(self, player, depth, alpha=-math.inf, beta=math.inf, first=None):
+        # Root search, returns (action, score) with the action as cell indices.
+        # `first` (e.g. the previous iteration's best action) is searched
+        # before the rest. Ties always go to the action that comes first in
+        # board order, whatever order the actions were searched in: actions
+        # before the current best are searched with the bound moved one point
+        # (scores are integers) so that an equal score is still exact.
+        maximizing = (player == PLAYER2)
+        if depth == 0 or self._move_mask(player, self._near) == 0:
+            return None, self._evaluate(player)
+        self._select_table(player)
+        self._age_history()
+
+        actions = self._root_actions(player, depth)
+        stats = self.stats
+        if stats is not None:
+            stats.root_depth = depth
+            stats.nodes += 1
+            stats.expanded += 1
+            root_moves = len({move for move, _, _ in actions})
+            stats.moves += root_moves
+            stats.move_expansions += root_moves
+            stats.blackout_pairs += len(actions)
+        order = list(range(len(actions)))
+        for i, (move, blacks, _) in enumerate(actions):
+            if (move, blacks) == first:
+                order.insert(0, order.pop(i))
+                break
+
+        best_index = None
+        best = -math.inf if maximizing else math.inf
+        for i in order:
+            window = _root_window(maximizing, alpha, beta, best_index, i)
+            if window is None:
+                continue
+            if self.search == 'pvs' and best_index is not None:
+                score = self._search_null_window(player, depth, actions[i], maximizing, *window)
+            else:
+                score = self._search_action(player, depth, actions[i], *window)
+            if _improves(maximizing, score, i, best, best_index):
+                best, best_index = score, i
+            if maximizing:
+                alpha = max(alpha, best)
+            else:
+                beta = min(beta, best)
+
+        move, blacks, _ = actions[best_index]
+        return (move, blacks), best
+
+    def _select_table(self, player):
+        # searches for `player` read and fill that player's table; scores
+        # stored under one evaluation are wrong under the other, so a side
+        # that switched evaluation starts again from empty tables, while the
+        # other side keeps its own
+        if self._table_evaluations[player] != self._evaluation:
+            if self.tt is not None:
+                self.tt[player].clear()
+            for table in (self._move_history[player], self._black_history[player]):
+                table[:] = [0] * len(table)
+            self._table_evaluations[player] = self._evaluation
+        self._tt = self.tt[player] if self.tt is not None else None
+
+    def _root_actions(self, player, depth=None):
+        return list(self._actions(player, self._blackout_targets(), depth))
+
+    def _search_action(self, player, depth, action, alpha, beta):
+        # score of one root action searched with the (alpha, beta) window
+        move, _, mask = action
+        self._make_move(player, move)
+        self._make_blackouts(mask)
+        score = self._minimax(depth - 1, alpha, beta, player == PLAYER1)
+        self._unmake()
+        self._unmake()
+        return score
+
+    def _search_null_window(self, player, depth, action, maximizing, alpha, beta):
+        # PVS at the root: a null window test first, the (alpha, beta)
+        # window only when the action may be better than the best so far
+        if maximizing:
+            score = self._search_action(player, depth, action, alpha, _above(alpha))
         else:
-            # humans turn (PLAYER1)
-            min_eval = math.inf
-
-            
-            moves = self.get_legal_moves(PLAYER1)
-
-            
-            for move in moves:
-                
-                board_backup = [row[:] for row in self.board]
-                cp_backup = self.current_player
-               
-                self.apply_move(move, PLAYER1)
-                
-                
-                opponent = PLAYER2
-                if self.blackout_mode == 'legal':
-                    ai_moves = self.get_legal_moves(opponent)
-                else:
-                    ai_moves = self.get_distant_moves(opponent)             
+            score = self._search_action(player, depth, action, _below(beta), beta)
+        if alpha < score < beta:
+            if self.stats is not None:
+                self.stats.researches += 1
+            score = self._search_action(player, depth, action, alpha, beta)
+        return score
 
-                if len(ai_moves) >= 2:                   
-                    combos = list(itertools.combinations(ai_moves, 2))
-                else:
-                    combos = [tuple(ai_moves)]  #blackout all remaining moves 0, 1 or 2
-
-                
-                for blacks in combos:
-                    board2_backup = [row[:] for row in self.board]
-                   
-                    self.apply_blackouts(blacks)
-                  
-                    self.current_player = PLAYER2
-                    
-                    _, score = self.minimax(depth - 1, alpha, beta, True)
-                    
-                    self.board = [row[:] for row in board2_backup]
-                    self.current_player = PLAYER1
-                  
-                    if score < min_eval or best_action is None:
-                        min_eval = score
-                        best_action = (move, blacks)
-
-                   
-                    beta = min(beta, min_eval)
-                    if beta <= alpha:
-                        break  
+    def _action_coords(self, action):
+        move, blacks = action
+        return self._coords(move), tuple(self._coords(c) for c in blacks)
 
-                
-                self.board = [row[:] for row in board_backup]
-                self.current_player = cp_backup
-                if beta <= alpha:
-                    break  
+    def minimax(self, depth, alpha, beta, maximizing):
+
+        # the root returns the action as well as the score, inner nodes only
+        # need the score (see _minimax)
+        player = PLAYER2 if maximizing else PLAYER1
+        action, score = self._search_root(player, depth, alpha, beta)
+        if action is None:
+            return None, score
+        return self._action_coords(action), score
 
-            return best_action, min_eval
+    def best_action_for(self, player, depth, workers=None):
 
-    def best_action_for(self, player, depth):
-        
+        _check_depth(depth)
         self.current_player = player
+        if workers and workers > 1:
+            # root actions split over a process pool, same result as below
+            from parallel_search import parallel_root_search
+            action, _ = parallel_root_search(self, player, depth, workers)
+            return None if action is None else self._action_coords(action)
         maximizing = (player == PLAYER2)
-        action, _ = self.minimax(depth, -math.inf, math.inf, maximizing)
+        self._begin_stats(player)
+        started = time.perf_counter()
+        base = len(self._undo)
+        try:
+            action, _ = self.minimax(depth, -math.inf, math.inf, maximizing)
+        except SearchTimeout:
+            # cancelled: there is no action, the caller gets the exception
+            while len(self._undo) > base:
+                self._unmake()
+            self.stats = None
+            raise
+        finally:
+            self._cancelled = False
+        self._end_stats(player, depth, started)
         return action
+
+    def cancel(self):
+
+        # Stop the search running in another thread (or the next one to
+        # start).  best_action_within returns the action of its deepest
+        # completed iteration, best_action_for raises SearchTimeout.
+        self._cancelled = True
+
+    def _begin_stats(self, player):
+        if not self.collect_stats:
+            return
+        self.stats = SearchStats()
+        table = self.tt[player] if self.tt is not None else None
+        self._stats_base = (table.hits if table else 0,
+                            table.hits + table.misses if table else 0,
+                            self.endgame.solved)
+
+    def _end_stats(self, player, depth=None, started=None):
+        stats = self.stats
+        if stats is None:
+            return
+        if depth is not None:
+            stats.finish_iteration(depth, started)
+        stats.finish()
+        table = self.tt[player] if self.tt is not None else None
+        hits, probes, solved = self._stats_base
+        if table is not None:
+            stats.tt_hits = table.hits - hits
+            stats.tt_probes = table.hits + table.misses - probes
+        stats.endgame_solved = self.endgame.solved - solved
+        self.last_stats = stats
+        self.stats = None
+
+    def _search_aspiration(self, player, depth, first, previous):
+        # search a window around the previous iteration's score, and again
+        # with the full window when the score falls outside it
+        if not is_decided(previous):
+            alpha, beta = previous - ASPIRATION_WINDOW, previous + ASPIRATION_WINDOW
+            action, score = self._search_root(player, depth, alpha, beta, first=first)
+            if alpha < score < beta:
+                return action, score
+            if self.stats is not None:
+                self.stats.aspiration_researches += 1
+        return self._search_root(player, depth, first=first)
+
+    def best_action_within(self, player, seconds, max_depth=None):
+
+        # Iterative deepening: search depth 1, 2, ... until `seconds` run out
+        # and return the best action of the deepest completed iteration.
+        # Every iteration searches the previous best action first and the
+        # transposition table orders the rest of the previous PV.
+        if max_depth is not None:
+            _check_depth(max_depth, "max_depth")
+        self.current_player = player
+        start = time.perf_counter()
+        limit = self.size * self.size if max_depth is None else max_depth
+        action = None
+        self.last_depth = 0
+        base = len(self._undo)
+        self._begin_stats(player)
+        for depth in range(1, limit + 1):
+            # depth 1 always completes so that there is an action to return
+            self._deadline = start + seconds if depth > 1 else None
+            started = time.perf_counter()
+            try:
+                if self.search == 'pvs' and action is not None:
+                    action, score = self._search_aspiration(player, depth, action, score)
+                else:
+                    action, score = self._search_root(player, depth, first=action)
+            except SearchTimeout:
+                # unwind the moves the interrupted search had made
+                while len(self._undo) > base:
+                    self._unmake()
+                break
+            finally:
+                self._deadline = None
+            if self.stats is not None:
+                self.stats.finish_iteration(depth, started)
+            self.last_depth = depth
+            if action is None or is_decided(score):
+                break
+        self._cancelled = False
+        self._end_stats(player)
+        if action is None:
+            return None
+        return self._action_coords(action)
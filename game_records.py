@@ -0,0 +1,241 @@
+"""Compact binary game records.
+
+The detailed tournament JSON spells every move out as a dict with a
+player string and nested coordinate lists.  Here a game is a fixed header
+and three bytes per move, for boards of up to 8x8 (cells fit in 6 bits).
+
+An archive is MAGIC followed by records back to back.  A record is
+
+- header, HEADER: board size, flags (bit 0: 'distant' blackout mode,
+  bit 1: PLAYER2 moved first), both start cells, the result (0 draw,
+  else the winning player), the number of moves and the duration in
+  seconds as a float32
+- one 24-bit little-endian word per move: destination cell in bits 0-5,
+  the blackout cells in bits 6-11 and 12-17, their count in bits 18-19
+
+Players alternate from the first player, so moves do not store them, and
+search statistics are not kept.  In a tournament record config1 is
+PLAYER1, as in AITournament.run_match.
+
+    with open(path, "wb") as f:
+        writer = RecordWriter(f)
+        writer.write(game_record, start1=(3, 3), start2=(4, 4))
+    with open(path, "rb") as f:
+        for record in RecordReader(f):
+            game = record.game_at(10)       # the Game after ten moves
+"""
+import struct
+from functools import lru_cache
+
+from bitboard import cell_bits, cell_coords, cell_index
+from game import BOARD_SIZE, PLAYER1, PLAYER2, Game, opposite
+
+MAGIC = b"ISOG\x01"
+HEADER = struct.Struct("<BBBBBHf")
+MOVE_BYTES = 3
+MAX_SIZE = 8
+BLACKOUT_MODES = ('legal', 'distant')
+
+_WINNERS = {"config1": PLAYER1, "config2": PLAYER2, "draw": 0, None: 0}
+_PLAYER_NAMES = {PLAYER1: "config1", PLAYER2: "config2"}
+
+
+@lru_cache(maxsize=None)
+def default_starts(size):
+    """Start cells of both pawns on a new Game of `size`"""
+    game = Game(size=size, tt_bytes=0)
+    return game.pawns[PLAYER1], game.pawns[PLAYER2]
+
+
+def pack_move(move, blackouts, size):
+    cells = [cell_index(x, y, size) for x, y in blackouts]
+    if len(cells) > 2:
+        raise ValueError(f"a move blacks out at most two cells, not {len(cells)}")
+    word = cell_index(move[0], move[1], size) | len(cells) << 18
+    for i, cell in enumerate(cells):
+        word |= cell << 6 + 6 * i
+    return word
+
+
+def unpack_move(word):
+    """(destination, [blackout cells]) in cell indices"""
+    count = word >> 18
+    return word & 63, [word >> 6 + 6 * i & 63 for i in range(count)]
+
+
+class GameRecord:
+    """One decoded game; moves stay packed until asked for."""
+
+    __slots__ = ('size', 'blackout_mode', 'first_player', 'start1', 'start2', 'winner',
+                 'duration_sec', 'packed')
+
+    def __init__(self, size, blackout_mode, first_player, start1, start2, winner, duration_sec, packed):
+        self.size = size
+        self.blackout_mode = blackout_mode
+        self.first_player = first_player
+        # start cells are indices, winner is PLAYER1, PLAYER2 or 0 for a draw
+        self.start1 = start1
+        self.start2 = start2
+        self.winner = winner
+        self.duration_sec = duration_sec
+        # MOVE_BYTES bytes per move, see unpack_move
+        self.packed = packed
+
+    @classmethod
+    def from_game_record(cls, record, start1=None, start2=None, size=BOARD_SIZE,
+                         blackout_mode='legal', first_player=PLAYER1):
+        """Pack a game_record of AITournament.run_match; start squares
+        default to those of a new Game."""
+        if size > MAX_SIZE:
+            raise ValueError(f"binary records hold boards up to {MAX_SIZE}x{MAX_SIZE}, not {size}x{size}")
+        defaults = default_starts(size)
+        start1 = defaults[0] if start1 is None else cell_index(start1[0], start1[1], size)
+        start2 = defaults[1] if start2 is None else cell_index(start2[0], start2[1], size)
+        packed = bytearray()
+        player = first_player
+        for move in record["moves"]:
+            if move["player"] != _PLAYER_NAMES[player]:
+                raise ValueError(f"move {len(packed) // MOVE_BYTES} is by {move['player']}, "
+                                 f"expected {_PLAYER_NAMES[player]}")
+            packed += pack_move(move["move"], move["blackouts"] or (), size).to_bytes(MOVE_BYTES, "little")
+            player = opposite(player)
+        return cls(size, blackout_mode, first_player, start1, start2, _WINNERS[record["winner"]],
+                   record.get("duration_sec", 0.0), bytes(packed))
+
+    @property
+    def move_count(self):
+        return len(self.packed) // MOVE_BYTES
+
+    def words(self):
+        packed = self.packed
+        return [int.from_bytes(packed[i:i + MOVE_BYTES], "little") for i in range(0, len(packed), MOVE_BYTES)]
+
+    def moves(self):
+        """The moves as in a game_record: player, move and blackouts"""
+        size = self.size
+        player = self.first_player
+        moves = []
+        for word in self.words():
+            move, blacks = unpack_move(word)
+            moves.append({
+                "player": _PLAYER_NAMES[player],
+                "move": cell_coords(move, size),
+                "blackouts": [cell_coords(cell, size) for cell in blacks],
+            })
+            player = opposite(player)
+        return moves
+
+    def as_game_record(self):
+        """The game_record this was packed from, without search statistics"""
+        winner = _PLAYER_NAMES.get(self.winner, "draw")
+        moves = self.moves()
+        return {
+            "moves": moves,
+            "winner": winner,
+            "move_count": len(moves),
+            "duration_sec": self.duration_sec,
+            "blackout_positions": [cell for move in moves for cell in move["blackouts"]],
+        }
+
+    def states(self):
+        """Game.state() before the first move and after every move"""
+        bits = cell_bits(self.size)
+        blocked = bits[self.start1] | bits[self.start2]
+        pawns = [None, self.start1, self.start2]
+        player = self.first_player
+        yield (self.size, self.blackout_mode, player, blocked, pawns[PLAYER1], pawns[PLAYER2])
+        for word in self.words():
+            move = word & 63
+            blocked ^= bits[pawns[player]] | bits[move]
+            pawns[player] = move
+            for i in range(word >> 18):
+                blocked |= bits[word >> 6 + 6 * i & 63]
+            player = opposite(player)
+            yield (self.size, self.blackout_mode, player, blocked, pawns[PLAYER1], pawns[PLAYER2])
+
+    def state_at(self, ply):
+        """Game.state() after `ply` moves"""
+        if not 0 <= ply <= self.move_count:
+            raise IndexError(f"ply {ply} out of range 0..{self.move_count}")
+        for i, state in enumerate(self.states()):
+            if i == ply:
+                return state
+
+    def game_at(self, ply, game=None, tt_bytes=0):
+        """A Game in the position after `ply` moves; `game` is reused when given"""
+        state = self.state_at(ply)
+        if game is None:
+            return Game.from_state(state, tt_bytes=tt_bytes)
+        game.set_state(state)
+        return game
+
+    def to_bytes(self):
+        flags = BLACKOUT_MODES.index(self.blackout_mode) | (self.first_player == PLAYER2) << 1
+        return HEADER.pack(self.size, flags, self.start1, self.start2, self.winner,
+                           self.move_count, self.duration_sec) + self.packed
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """(record, offset of the next record) for the record at `offset`"""
+        size, flags, start1, start2, winner, count, duration = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        end = start + count * MOVE_BYTES
+        if end > len(data):
+            raise ValueError("truncated game record")
+        record = cls(size, BLACKOUT_MODES[flags & 1], PLAYER2 if flags & 2 else PLAYER1,
+                     start1, start2, winner, duration, bytes(data[start:end]))
+        return record, end
+
+
+class RecordWriter:
+    """Appends records to a binary file opened for writing."""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+        if f.tell() == 0:
+            f.write(MAGIC)
+
+    def write(self, record, start1=None, start2=None, size=BOARD_SIZE, blackout_mode='legal',
+              first_player=PLAYER1):
+        """Write a GameRecord, or a game_record dict packed with the given setup"""
+        if not isinstance(record, GameRecord):
+            record = GameRecord.from_game_record(record, start1, start2, size, blackout_mode, first_player)
+        self.f.write(record.to_bytes())
+        self.count += 1
+
+
+class RecordReader:
+    """Streams the records of a binary file opened for reading."""
+
+    def __init__(self, f):
+        self.f = f
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError("not a game record archive")
+
+    def __iter__(self):
+        read = self.f.read
+        while True:
+            header = read(HEADER.size)
+            if not header:
+                return
+            if len(header) < HEADER.size:
+                raise ValueError("truncated game record header")
+            count = HEADER.unpack(header)[5]
+            record, _ = GameRecord.from_bytes(header + read(count * MOVE_BYTES))
+            yield record
+
+
+def write_archive(path, records, **setup):
+    """Write game_record dicts (or GameRecords) to a new archive at `path`"""
+    with open(path, "wb") as f:
+        writer = RecordWriter(f)
+        for record in records:
+            writer.write(record, **setup)
+        return writer.count
+
+
+def read_archive(path):
+    with open(path, "rb") as f:
+        return list(RecordReader(f))
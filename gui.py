@@ -1,12 +1,21 @@
 import tkinter as tk
-from game import Game, PLAYER1, PLAYER2, BLACKOUT,EMPTY,BOARD_SIZE,opposite
+from game import Game, PLAYER1, PLAYER2, BLACKOUT,EMPTY,opposite
+from search_worker import SearchWorker
 
 # GUI layout constants
 OFFSET = 30
 CELL_SIZE = 60
 
+# how often (ms) the GUI checks on the background search
+POLL_MS = 50
+# depth of the search that guesses the human's move while pondering
+PONDER_GUESS_DEPTH = 2
+MAX_DEPTH = 8
+NAMES = {PLAYER1: 'Blue', PLAYER2: 'Red'}
+PAWN_COLOURS = {PLAYER1: 'blue', PLAYER2: 'red'}
+
 class GUI:
-    def __init__(self, depth_blue=3, depth_red=3, ai_delay=500):
+    def __init__(self, depth_blue=3, depth_red=3, ai_delay=500, time_blue=None, time_red=None):
         self.root = tk.Tk()
         self.root.title("Isolation Game")
         
@@ -14,7 +23,23 @@ class GUI:
             PLAYER1: depth_blue,
             PLAYER2: depth_red
         }
+        # seconds per move; when set the AI searches by time instead of depth
+        self.ai_times = {
+            PLAYER1: time_blue,
+            PLAYER2: time_red
+        }
         self.ai_delay = ai_delay
+        # the AI searches on a background thread: `thinking` is the
+        # (player, job) whose action gets played, `waiting` a player whose
+        # search starts once the worker is free, `ponder` whether to search
+        # ahead on the human's turn
+        self.worker = SearchWorker()
+        self.thinking = None
+        self.waiting = None
+        self.ponder = False
+        self.ponder_state = None
+        self._polling = False
+        self.root.protocol('WM_DELETE_WINDOW', self._close)
         self.mode = tk.StringVar(value='vs AI')
         self.first = tk.IntVar(value=1)
         self._setup_start_menu()
@@ -41,17 +66,30 @@ class GUI:
         self._setup_ui()
         self._draw()
         self._update()
-        if self.mode.get() == 'vs AI' and self.game.current_player == PLAYER2:
-            self.root.after(self.ai_delay, self._ai_move)
-        elif self.mode.get() == 'AI vs AI':
-            self.root.after(self.ai_delay, self._auto_play)
+        self._next_turn()
 
     def _setup_ui(self):
-        width = OFFSET * 2 + BOARD_SIZE * CELL_SIZE
+        width = OFFSET * 2 + self.game.size * CELL_SIZE
         self.canvas = tk.Canvas(self.root, width=width, height=width)
         self.canvas.pack()
+        self._create_board()
         self.label = tk.Label(self.root, font=('Arial', 14))
         self.label.pack(pady=5)
+        self.thinking_label = tk.Label(self.root, font=('Arial', 11), fg='gray')
+        self.thinking_label.pack()
+        controls = tk.Frame(self.root)
+        controls.pack(pady=5)
+        self.depth_vars = {}
+        for column, player in enumerate((PLAYER1, PLAYER2)):
+            if self.mode.get() == '1v1' or self.mode.get() == 'vs AI' and player == PLAYER1:
+                continue
+            var = tk.IntVar(value=self.ai_depths[player])
+            self.depth_vars[player] = var
+            tk.Label(controls, text=f"{NAMES[player]} depth:").grid(row=0, column=2*column)
+            tk.Spinbox(controls, from_=1, to=MAX_DEPTH, width=3, textvariable=var,
+                       command=lambda p=player: self._set_depth(p)).grid(row=0, column=2*column+1)
+        if self.depth_vars:
+            tk.Button(controls, text="Move now", command=self._move_now).grid(row=0, column=4, padx=10)
         self.canvas.bind('<Button-1>', self._on_click)
 
     def _update(self):
@@ -62,50 +100,69 @@ class GUI:
             turn = 'Blue' if self.game.current_player==PLAYER1 else 'Red'
             self.label.config(text=f"{turn}'s turn ({self.current_phase})")
 
-    def _draw(self):
+    def _create_board(self):
+        # create every canvas item once; _draw only reconfigures them
         cv = self.canvas
-        cv.delete('all')
-        # draw coordinates
-        for i in range(BOARD_SIZE):
+        size = self.game.size
+        for i in range(size):
             x = OFFSET + i*CELL_SIZE + CELL_SIZE/2
-            y = OFFSET + BOARD_SIZE*CELL_SIZE + 15
+            y = OFFSET + size*CELL_SIZE + 15
             cv.create_text(x, y, text=chr(ord('a')+i))
             xi = OFFSET - 15
             yi = OFFSET + i*CELL_SIZE + CELL_SIZE/2
-            cv.create_text(xi, yi, text=str(BOARD_SIZE-i))
-        # draw cells
-        for y in range(BOARD_SIZE):
-            for x in range(BOARD_SIZE):
+            cv.create_text(xi, yi, text=str(size-i))
+        # per cell: (square, pawn oval, highlight outline)
+        self.cell_items = {}
+        for y in range(size):
+            for x in range(size):
                 x0 = OFFSET + x*CELL_SIZE
                 y0 = OFFSET + y*CELL_SIZE
                 x1 = x0 + CELL_SIZE
                 y1 = y0 + CELL_SIZE
-                cv.create_rectangle(x0, y0, x1, y1, fill='white', outline='gray')
-                c = self.game.board[y][x]
-                if c==PLAYER1:
-                    cv.create_oval(x0+5, y0+5, x1-5, y1-5, fill='blue')
-                elif c==PLAYER2:
-                    cv.create_oval(x0+5, y0+5, x1-5, y1-5, fill='red')
-                elif c==BLACKOUT:
-                    cv.create_rectangle(x0, y0, x1, y1, fill='black')
-        # highlight legal actions
+                square = cv.create_rectangle(x0, y0, x1, y1, fill='white', outline='gray')
+                pawn = cv.create_oval(x0+5, y0+5, x1-5, y1-5, state='hidden')
+                highlight = cv.create_rectangle(x0, y0, x1, y1, width=3, state='hidden')
+                self.cell_items[(x, y)] = (square, pawn, highlight)
+        # (cell value, highlight colour) of every cell as last drawn
+        self.drawn = {}
+
+    def _draw(self):
+        # bring the canvas up to date, touching only the cells that changed
+        # since the last call
+        highlights = {}
         if not self.game.is_terminal():
             if self.current_phase=='move':
-                for mx,my in self.game.get_legal_moves(self.game.current_player):
-                    cv.create_rectangle(OFFSET+mx*CELL_SIZE, OFFSET+my*CELL_SIZE,
-                                        OFFSET+(mx+1)*CELL_SIZE, OFFSET+(my+1)*CELL_SIZE,
-                                        outline='green', width=3)
+                for move in self.game.get_legal_moves(self.game.current_player):
+                    highlights[move] = 'green'
             else:
-                for bx,by in self.selected_blackouts:
-                    cv.create_rectangle(OFFSET+bx*CELL_SIZE, OFFSET+by*CELL_SIZE,
-                                        OFFSET+(bx+1)*CELL_SIZE, OFFSET+(by+1)*CELL_SIZE,
-                                        outline='yellow', width=3)
+                for cell in self.selected_blackouts:
+                    highlights[cell] = 'yellow'
+        cv = self.canvas
+        game = self.game
+        for (x, y), (square, pawn, highlight) in self.cell_items.items():
+            look = (game.cell((x, y)), highlights.get((x, y)))
+            old = self.drawn.get((x, y))
+            if look == old:
+                continue
+            self.drawn[(x, y)] = look
+            c, outline = look
+            if old is None or c != old[0]:
+                cv.itemconfigure(square, fill='black' if c==BLACKOUT else 'white')
+                if c in PAWN_COLOURS:
+                    cv.itemconfigure(pawn, fill=PAWN_COLOURS[c], state='normal')
+                else:
+                    cv.itemconfigure(pawn, state='hidden')
+            if old is None or outline != old[1]:
+                if outline is None:
+                    cv.itemconfigure(highlight, state='hidden')
+                else:
+                    cv.itemconfigure(highlight, outline=outline, state='normal')
 
     def _on_click(self, event):
         gx = (event.x - OFFSET)//CELL_SIZE
         gy = (event.y - OFFSET)//CELL_SIZE
-        if not (0<=gx<BOARD_SIZE and 0<=gy<BOARD_SIZE): return
-        if self.game.is_terminal(): return
+        if not (0<=gx<self.game.size and 0<=gy<self.game.size): return
+        if self.game.is_terminal() or self._is_ai(self.game.current_player): return
         if self.current_phase=='move' and (gx,gy) in self.game.get_legal_moves(self.game.current_player):
             self.game.apply_move((gx,gy), self.game.current_player)
             self.current_phase='blackout'
@@ -126,34 +183,85 @@ class GUI:
         self.current_phase='move'
         self._update()
         self._draw()
-        if self.mode.get()=='vs AI' and self.game.current_player==PLAYER2 and not self.game.is_terminal():
-            self.root.after(self.ai_delay, self._ai_move)
+        self._next_turn()
 
-    def _auto_play(self):
+    def _is_ai(self, player):
+        return self.mode.get()=='AI vs AI' or self.mode.get()=='vs AI' and player==PLAYER2
+
+    def _next_turn(self):
         if self.game.is_terminal():
-            self._update()
+            self.ponder = False
+            self.worker.cancel()
             return
-
         player = self.game.current_player
-        depth  = self.ai_depths[player]
-        action = self.game.best_action_for(player, depth)
+        if self._is_ai(player):
+            self._ai_turn(player)
+        elif self.mode.get()=='vs AI':
+            # the human is thinking: search ahead on the move we expect
+            self.ponder = True
+            self.ponder_state = self.game.state()
+            self._schedule_poll()
 
-        if action:
-            move, blacks = action
-            self.game.apply_move(move, player)
-            if blacks:
-                self.game.apply_blackouts(blacks)
+    def _ai_turn(self, player):
+        self.ponder = False
+        job = self.worker.job
+        if self._pondering(job) and job.target == self.game.state():
+            # the human played the predicted move, keep the pondering search
+            self.thinking = (player, job)
+        else:
+            self.worker.cancel()
+            self.waiting = player
+        self._schedule_poll()
 
-        self.game.current_player = opposite(player)
-        self._update()
-        self._draw()
-        self.root.after(self.ai_delay, self._auto_play)
+    def _search_depth(self, player):
+        # with a time control the search goes as deep as the time allows
+        return None if self.ai_times[player] else self.ai_depths[player]
 
-    def _ai_move(self):
-        player = self.game.current_player
-        depth  = self.ai_depths[player]
-        action = self.game.best_action_for(player, depth)
+    def _pondering(self, job):
+        # whether job is a live ponder search of this human turn
+        return (job is not None and job.ponder_depth and not job.cancelled
+                and job.state == self.ponder_state and job.depth == self._search_depth(PLAYER2))
 
+    def _start_search(self, player, ponder=False):
+        depth = self._search_depth(player)
+        seconds = self.ai_times[player]
+        if ponder:
+            guess_depth = min(PONDER_GUESS_DEPTH, self.ai_depths[player])
+            return self.worker.start(self.ponder_state, player, depth, seconds, ponder_depth=guess_depth)
+        return self.worker.start(self.game.state(), player, depth, seconds)
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        if not self.worker.busy():
+            if self.waiting is not None:
+                player, self.waiting = self.waiting, None
+                self.thinking = (player, self._start_search(player))
+            elif self.ponder and not self._pondering(self.worker.job):
+                self._start_search(PLAYER2, ponder=True)
+        if self.thinking is not None and self.thinking[1].done:
+            player, job = self.thinking
+            self.thinking = None
+            if job.error is not None:
+                raise job.error
+            if not job.cancelled:
+                self._play_ai(player, job.action)
+        depth, nodes = self.worker.progress()
+        if self.thinking is not None:
+            self.thinking_label.config(
+                text=f"{NAMES[self.thinking[0]]} is thinking... depth {depth}, {nodes:,} nodes")
+        elif self.ponder and self.worker.busy():
+            self.thinking_label.config(text=f"{NAMES[PLAYER2]} is pondering... {nodes:,} nodes")
+        else:
+            self.thinking_label.config(text='')
+        if self.thinking is not None or self.waiting is not None or self.ponder and self.worker.busy():
+            self._schedule_poll()
+
+    def _play_ai(self, player, action):
         if action:
             move, blacks = action
             self.game.apply_move(move, player)
@@ -163,9 +271,28 @@ class GUI:
         self.game.current_player = opposite(player)
         self._update()
         self._draw()
+        self.root.after(self.ai_delay, self._next_turn)
+
+    def _set_depth(self, player):
+        self.ai_depths[player] = self.depth_vars[player].get()
+        if self.thinking is not None and self.thinking[0] == player:
+            # restart at the new depth, the table keeps what was searched
+            self.thinking = None
+            self.worker.cancel()
+            self.waiting = player
+            self._schedule_poll()
+        elif self.ponder:
+            self.worker.cancel()
+            self._schedule_poll()
+
+    def _move_now(self):
+        if self.thinking is not None:
+            self.worker.cancel(discard=False)
 
-        if not self.game.is_terminal() and self.mode.get()=='vs AI' and self.game.current_player==PLAYER2:
-            self.root.after(self.ai_delay, self._ai_move)
+    def _close(self):
+        self.worker.cancel()
+        self.root.destroy()
 
-def main(depth_blue=3, depth_red=3, ai_delay=10):
-    GUI(depth_blue=depth_blue, depth_red=depth_red, ai_delay=ai_delay)
+def main(depth_blue=3, depth_red=3, ai_delay=10, time_blue=None, time_red=None):
+    GUI(depth_blue=depth_blue, depth_red=depth_red, ai_delay=ai_delay,
+        time_blue=time_blue, time_red=time_red)
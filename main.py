@@ -1,6 +1,10 @@
-from gui import main
+import sys
 
 if __name__ == '__main__':
-    
-    main()
+    # with arguments run the headless command line, otherwise the Tk game
+    if len(sys.argv) > 1:
+        from cli import main
+        sys.exit(main())
 
+    from gui import main
+    main()
@@ -0,0 +1,233 @@
+"""Monte Carlo tree search player for the Isolation game.
+
+Full-width minimax branches on every move times every blackout pair.
+UCT instead grows a tree one action per iteration, picks children by the
+UCB1 bound and scores new leaves with a random playout to the end of the
+game.  An iteration or time budget bounds the search, so it scales to any
+branching factor.
+
+The tree is kept between moves: after a search the subtree of the chosen
+action becomes the root, and the next search starts from the child of it
+that matches the opponent's reply, if the tree has one.
+
+    engine = MCTSEngine(game, seed=1)
+    action = engine.best_action_for(PLAYER2, seconds=1.0)
+    engine.last_stats.as_dict()     # rollouts, rollouts per second, ...
+"""
+import math
+import random
+import time
+
+from bitboard import bit_list, popcount
+from game import PLAYER1, PLAYER2, opposite
+
+DEFAULT_ITERATIONS = 2000
+# exploration constant of the UCB1 bound
+EXPLORATION = math.sqrt(2)
+# 'random' playouts pick moves uniformly, 'light' ones pick the move that
+# keeps the most free neighbours; blackouts are always random
+POLICIES = ('random', 'light')
+
+
+class _Node:
+    # `action` is the (move, blackout cells, blackout mask) that led here, in
+    # cell indices, `player` the player to move; `wins` counts the playouts
+    # won by the player who made `action`
+    __slots__ = ('action', 'player', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, action, player):
+        self.action = action
+        self.player = player
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0
+
+
+class MCTSStats:
+    """Statistics of one MCTSEngine.best_action_for call."""
+
+    def __init__(self):
+        self.rollouts = 0
+        self.nodes = 0
+        self.reused_visits = 0
+        self.max_depth = 0
+        self.seconds = 0.0
+
+    @property
+    def rollouts_per_sec(self):
+        return self.rollouts / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "rollouts": self.rollouts,
+            "nodes": self.nodes,
+            "reused_visits": self.reused_visits,
+            "max_depth": self.max_depth,
+            "seconds": self.seconds,
+            "rollouts_per_sec": self.rollouts_per_sec,
+        }
+
+
+class MCTSEngine:
+    """UCT search over the actions of one Game.
+
+    The engine plays on the game it is given with make/unmake and leaves
+    it as it found it.
+    """
+
+    def __init__(self, game, policy='random', exploration=EXPLORATION, seed=None, reuse_tree=True):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown playout policy {policy!r}, expected one of {POLICIES}")
+        self.game = game
+        self.policy = policy
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.rng = random.Random(seed)
+        self.last_stats = None
+        # root of the kept tree and the position it stands for, see _key
+        self._root = None
+        self._root_key = None
+
+    def _key(self):
+        game = self.game
+        return game.blocked, game.pawns[PLAYER1], game.pawns[PLAYER2]
+
+    def _child_key(self, key, player, action):
+        # position after `player` plays `action` from position `key`
+        blocked, pawn1, pawn2 = key
+        move, _, mask = action
+        bits = self.game._bits
+        old = pawn1 if player == PLAYER1 else pawn2
+        blocked = (blocked ^ bits[old] ^ bits[move]) | mask
+        if player == PLAYER1:
+            return blocked, move, pawn2
+        return blocked, pawn1, move
+
+    def _find_root(self, player):
+        # the kept node for the current position, or a new one
+        key = self._key()
+        root = self._root
+        if root is not None and self.reuse_tree:
+            if self._root_key == key and root.player == player:
+                return root
+            for child in root.children:
+                if child.player == player and self._child_key(self._root_key, root.player, child.action) == key:
+                    return child
+        return _Node(None, player)
+
+    def best_action_for(self, player, iterations=None, seconds=None):
+        """Action for `player` after `iterations` playouts or `seconds`.
+
+        With neither budget DEFAULT_ITERATIONS playouts are run; with both
+        the search stops at whichever runs out first.  Returns
+        ((x, y), blackouts) like Game.best_action_for, or None when
+        `player` cannot move.
+        """
+        game = self.game
+        game.current_player = player
+        if not game._move_mask(player, game._near):
+            self._root = None
+            return None
+        if iterations is None and seconds is None:
+            iterations = DEFAULT_ITERATIONS
+
+        stats = MCTSStats()
+        root = self._find_root(player)
+        stats.reused_visits = root.visits
+        start = time.perf_counter()
+        deadline = start + seconds if seconds is not None else None
+        while True:
+            if iterations is not None and stats.rollouts >= iterations:
+                break
+            # at least one playout so that the root has a child to pick
+            if deadline is not None and stats.rollouts and time.perf_counter() > deadline:
+                break
+            self._iterate(root, stats)
+        stats.seconds = time.perf_counter() - start
+        self.last_stats = stats
+
+        best = max(root.children, key=lambda child: child.visits)
+        key = self._child_key(self._key(), player, best.action)
+        self._root, self._root_key = best, key
+        move, blacks, _ = best.action
+        return game._action_coords((move, blacks))
+
+    def _iterate(self, root, stats):
+        game = self.game
+        targets = game._blackout_targets()
+        base = len(game._undo)
+        node = root
+        path = [root]
+        # selection down to a node with untried actions, then expansion
+        while True:
+            if node.untried is None:
+                node.untried = list(game._actions(node.player, targets))
+                self.rng.shuffle(node.untried)
+            if node.untried:
+                action = node.untried.pop()
+                self._make(node.player, action)
+                child = _Node(action, opposite(node.player))
+                node.children.append(child)
+                stats.nodes += 1
+                path.append(child)
+                node = child
+                break
+            if not node.children:
+                break  # the player to move is stuck
+            node = self._select(node)
+            self._make(opposite(node.player), node.action)
+            path.append(node)
+        stats.max_depth = max(stats.max_depth, len(path) - 1)
+
+        winner = self._rollout(node.player, targets)
+        stats.rollouts += 1
+        while len(game._undo) > base:
+            game._unmake()
+        for node in path:
+            node.visits += 1
+            if winner != node.player:
+                node.wins += 1
+
+    def _make(self, player, action):
+        move, _, mask = action
+        self.game._make_move(player, move)
+        self.game._make_blackouts(mask)
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        c = self.exploration
+        return max(node.children,
+                   key=lambda child: child.wins / child.visits + c * math.sqrt(log_visits / child.visits))
+
+    def _rollout(self, player, targets):
+        # play the game out from the current position on plain ints and
+        # return the winner
+        game = self.game
+        near = game._near
+        bits = game._bits
+        rng = self.rng
+        light = self.policy == 'light'
+        blocked = game.blocked
+        pawns = [None, game.pawns[PLAYER1], game.pawns[PLAYER2]]
+        while True:
+            moves = near[pawns[player]] & ~blocked
+            if not moves:
+                return opposite(player)
+            cells = bit_list(moves)
+            if light and len(cells) > 1:
+                best = -1
+                for cell in cells:
+                    free = popcount(near[cell] & ~blocked)
+                    if free > best or free == best and rng.random() < 0.5:
+                        best, move = free, cell
+            else:
+                move = rng.choice(cells)
+            blocked ^= bits[pawns[player]] | bits[move]
+            pawns[player] = move
+            player = PLAYER1 if player == PLAYER2 else PLAYER2
+            cells = bit_list(targets[pawns[player]] & ~blocked)
+            if len(cells) > 2:
+                cells = rng.sample(cells, 2)
+            for cell in cells:
+                blocked |= bits[cell]
@@ -0,0 +1,157 @@
+"""Root-split parallel search for Game.best_action_for.
+
+The root actions (move, blackout pair) of one position are cut into
+contiguous chunks and searched on a process pool.  The workers share the
+best root score found so far, and the index of its action, through shared
+memory and search every action against it, so alpha-beta keeps pruning
+across processes.  Ties go to the action that comes first in board order,
+exactly as in Game._search_root, so the result is always the serial one.
+"""
+import atexit
+import math
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game import PLAYER2, Game, _improves, _root_window
+
+CHUNKS_PER_WORKER = 4
+
+_pools = {}
+
+# worker process state
+_shared = None
+_game = None
+
+
+def _init_worker(score, index):
+    global _shared
+    _shared = (score, index)
+
+
+def _load(state):
+    # one Game per worker process, reloaded for every position so that its
+    # transposition tables carry over from move to move
+    global _game
+    if _game is None or _game.size != state[0]:
+        _game = Game.from_state(state)
+    else:
+        _game.set_state(state)
+    return _game
+
+
+def _root_bounds(maximizing, best, best_index):
+    if best_index is None:
+        return -math.inf, math.inf
+    if maximizing:
+        return best, math.inf
+    return -math.inf, best
+
+
+def _search_chunk(state, player, depth, indices, evaluation):
+    game = _load(state)
+    game.evaluation = evaluation
+    game._select_table(player)
+    maximizing = (player == PLAYER2)
+    actions = game._root_actions(player, depth)
+    score_value, index_value = _shared
+    lock = score_value.get_lock()
+    results = []
+    for i in indices:
+        with lock:
+            best, best_index = score_value.value, index_value.value
+        best_index = None if best_index < 0 else best_index
+        window = _root_window(maximizing, *_root_bounds(maximizing, best, best_index), best_index, i)
+        if window is None:
+            continue
+        score = game._search_action(player, depth, actions[i], *window)
+        lo, hi = window
+        if maximizing and lo > -math.inf and score <= lo or not maximizing and hi < math.inf and score >= hi:
+            continue  # only a bound, some other action is at least as good
+        results.append((i, score))
+        with lock:
+            best, best_index = score_value.value, index_value.value
+            if _improves(maximizing, score, i, best, None if best_index < 0 else best_index):
+                score_value.value = score
+                index_value.value = i
+    return results
+
+
+def _pool(workers):
+    if workers not in _pools:
+        score = mp.Value('d', 0.0)
+        index = mp.Value('i', -1)
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(score, index))
+        _pools[workers] = (executor, score, index)
+    return _pools[workers]
+
+
+@atexit.register
+def shutdown_pools():
+    for executor, _, _ in _pools.values():
+        executor.shutdown(cancel_futures=True)
+    _pools.clear()
+
+
+def parallel_root_search(game, player, depth, workers):
+    """Search the root of ``game`` on ``workers`` processes.
+
+    Returns ``(action, score)`` like Game._search_root, with the action as
+    cell indices.
+    """
+    maximizing = (player == PLAYER2)
+    if depth == 0 or not game._move_mask(player, game._near):
+        return None, game._evaluate(player)
+
+    actions = game._root_actions(player, depth)
+    executor, score_value, index_value = _pool(workers)
+    with score_value.get_lock():
+        score_value.value = 0.0
+        index_value.value = -1
+
+    n_chunks = min(len(actions), workers * CHUNKS_PER_WORKER)
+    bounds = [len(actions) * k // n_chunks for k in range(n_chunks + 1)]
+    state = game.state()
+    futures = [executor.submit(_search_chunk, state, player, depth, range(lo, hi), game.evaluation)
+               for lo, hi in zip(bounds, bounds[1:])]
+
+    best, best_index = None, None
+    for future in as_completed(futures):
+        for i, score in future.result():
+            if _improves(maximizing, score, i, best, best_index):
+                best, best_index = score, i
+    move, blacks, _ = actions[best_index]
+    return (move, blacks), best
+
+
+def report_speedup(depth=4, player=PLAYER2, worker_counts=None):
+    """Time one search from the opening position per worker count."""
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, cpus} | {n for n in (8, 16) if n <= cpus})
+    rows = []
+    serial_time = None
+    serial_action = None
+    for workers in worker_counts:
+        game = Game(mode='AI vs AI')
+        if workers > 1:
+            _pool(workers)  # pool start-up is not part of the search time
+        start = time.perf_counter()
+        action = game.best_action_for(player, depth, workers=workers)
+        elapsed = time.perf_counter() - start
+        if serial_time is None:
+            serial_time, serial_action = elapsed, action
+        rows.append({
+            "workers": workers,
+            "seconds": elapsed,
+            "speedup": serial_time / elapsed,
+            "same_action": action == serial_action,
+        })
+        print(f"workers={workers:2d}  {elapsed:8.3f}s  speedup {serial_time / elapsed:5.2f}x  "
+              f"action {action}{'' if action == serial_action else '  (DIFFERS)'}")
+    return rows
+
+
+if __name__ == "__main__":
+    report_speedup()
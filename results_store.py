@@ -0,0 +1,156 @@
+"""SQLite store for tournament results.
+
+One database holds every tournament: a row per match with the summary
+columns the reports use, a row per game and a row per move.  Matches are
+written as they finish, each in its own transaction, so a report can
+query a running tournament, and reports read only the match columns they
+need instead of loading every game's move list.
+
+Tables (all keyed by the tournament timestamp):
+
+- matches: config names, depths, time controls, engines and positions,
+  wins, draws, average moves and duration, plus both configs as JSON
+- games: winner, number of moves and duration of each game of a match
+- moves: player, move and blackouts of every move, with its search stats
+
+Positions are stored as text, ``"(x, y)"`` or ``"default"``.
+"""
+import json
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    tournament TEXT NOT NULL,
+    match_id TEXT NOT NULL,
+    config1_name TEXT, config1_depth INTEGER, config1_time REAL,
+    config1_engine TEXT, config1_position TEXT,
+    config2_name TEXT, config2_depth INTEGER, config2_time REAL,
+    config2_engine TEXT, config2_position TEXT,
+    config1_wins INTEGER, config2_wins INTEGER, draws INTEGER,
+    avg_moves REAL, avg_duration_sec REAL,
+    config1 TEXT, config2 TEXT,
+    UNIQUE (tournament, match_id)
+);
+CREATE INDEX IF NOT EXISTS matches_config1_depth ON matches (tournament, config1_depth);
+CREATE INDEX IF NOT EXISTS matches_config2_depth ON matches (tournament, config2_depth);
+CREATE INDEX IF NOT EXISTS matches_config1_position ON matches (tournament, config1_position);
+CREATE INDEX IF NOT EXISTS matches_config2_position ON matches (tournament, config2_position);
+CREATE INDEX IF NOT EXISTS matches_config1_name ON matches (config1_name);
+CREATE INDEX IF NOT EXISTS matches_config2_name ON matches (config2_name);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    match INTEGER NOT NULL REFERENCES matches (id) ON DELETE CASCADE,
+    game_num INTEGER,
+    winner TEXT,
+    move_count INTEGER,
+    duration_sec REAL
+);
+CREATE INDEX IF NOT EXISTS games_match ON games (match);
+
+CREATE TABLE IF NOT EXISTS moves (
+    game INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    ply INTEGER NOT NULL,
+    player TEXT,
+    move TEXT,
+    blackouts TEXT,
+    stats TEXT,
+    PRIMARY KEY (game, ply)
+) WITHOUT ROWID;
+"""
+
+# the match columns of a summary row, in the order of the summary CSV
+SUMMARY_COLUMNS = (
+    "config1_name", "config1_depth", "config1_position",
+    "config2_name", "config2_depth", "config2_position",
+    "config1_wins", "config2_wins", "avg_moves", "avg_duration_sec",
+)
+
+
+def position_label(pos):
+    if pos is None or pos == "default":
+        return "default"
+    x, y = pos
+    return f"({x}, {y})"
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add_match(self, tournament, match_id, match):
+        """Insert one finished match with its games and moves.
+
+        A match already stored under the same id (e.g. replayed after a
+        resume) is replaced.
+        """
+        config1, config2 = match["config1"], match["config2"]
+        results = match["results"]
+        summary = results["summary"]
+        with self.conn:
+            self.conn.execute("DELETE FROM matches WHERE tournament = ? AND match_id = ?",
+                              (tournament, match_id))
+            cursor = self.conn.execute(
+                "INSERT INTO matches (tournament, match_id,"
+                " config1_name, config1_depth, config1_time, config1_engine, config1_position,"
+                " config2_name, config2_depth, config2_time, config2_engine, config2_position,"
+                " config1_wins, config2_wins, draws, avg_moves, avg_duration_sec, config1, config2)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (tournament, match_id,
+                 config1["name"], config1.get("depth"), config1.get("time"),
+                 config1.get("engine", "minimax"), position_label(config1.get("start_pos")),
+                 config2["name"], config2.get("depth"), config2.get("time"),
+                 config2.get("engine", "minimax"), position_label(config2.get("start_pos")),
+                 summary["config1_wins"], summary["config2_wins"], summary.get("draws", 0),
+                 summary["avg_moves"], summary["avg_duration_sec"],
+                 json.dumps(config1), json.dumps(config2)))
+            match_row = cursor.lastrowid
+            for game_num, game in enumerate(results.get("games", [])):
+                cursor = self.conn.execute(
+                    "INSERT INTO games (match, game_num, winner, move_count, duration_sec)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (match_row, game_num, game["winner"], game["move_count"], game["duration_sec"]))
+                game_row = cursor.lastrowid
+                self.conn.executemany(
+                    "INSERT INTO moves (game, ply, player, move, blackouts, stats) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((game_row, ply, move["player"], json.dumps(move["move"]), json.dumps(move["blackouts"]),
+                      json.dumps(move["stats"]) if move.get("stats") else None)
+                     for ply, move in enumerate(game["moves"])))
+
+    def tournaments(self):
+        """Timestamps of the stored tournaments, oldest first."""
+        rows = self.conn.execute("SELECT DISTINCT tournament FROM matches ORDER BY tournament")
+        return [tournament for tournament, in rows]
+
+    def latest_tournament(self):
+        row = self.conn.execute("SELECT MAX(tournament) FROM matches").fetchone()
+        return row[0]
+
+    def summary_query(self, tournament, columns=SUMMARY_COLUMNS):
+        """(sql, parameters) selecting `columns` of a tournament's matches
+        in the order they were stored, e.g. for pandas.read_sql_query."""
+        for column in columns:
+            if column not in SUMMARY_COLUMNS + ("match_id", "draws", "config1_time", "config2_time",
+                                                "config1_engine", "config2_engine"):
+                raise ValueError(f"unknown match column {column!r}")
+        return f"SELECT {', '.join(columns)} FROM matches WHERE tournament = ? ORDER BY id", (tournament,)
+
+    def summary_rows(self, tournament, columns=SUMMARY_COLUMNS):
+        """The summary columns of a tournament's matches as dicts."""
+        sql, parameters = self.summary_query(tournament, columns)
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, parameters)]
+
+    def match_ids(self, tournament):
+        rows = self.conn.execute("SELECT match_id FROM matches WHERE tournament = ?", (tournament,))
+        return {match_id for match_id, in rows}
+
+    def match_count(self, tournament):
+        return self.conn.execute("SELECT COUNT(*) FROM matches WHERE tournament = ?",
+                                 (tournament,)).fetchone()[0]
@@ -0,0 +1,80 @@
+"""Counters collected by Game searches when statistics are switched on."""
+import time
+
+
+class SearchStats:
+    """Statistics of one best_action_for / best_action_within call.
+
+    Nodes count every position the search visited, including the leaves
+    that nodes one ply above the horizon score directly.  Branching is
+    split in two: the pawn moves per expanded node and the blackout pairs
+    per generated move.
+    """
+
+    def __init__(self):
+        self.root_depth = 0
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.cutoff_plies = {}
+        self.researches = 0
+        self.aspiration_researches = 0
+        self.expanded = 0
+        self.moves = 0
+        self.move_expansions = 0
+        self.blackout_pairs = 0
+        self.tt_hits = 0
+        self.tt_probes = 0
+        self.endgame_solved = 0
+        self.iterations = []
+        self._started = time.perf_counter()
+        self._finished = None
+        self._iteration_nodes = 0
+
+    def cutoff(self, ply):
+        self.cutoffs += 1
+        self.cutoff_plies[ply] = self.cutoff_plies.get(ply, 0) + 1
+
+    def finish_iteration(self, depth, started):
+        self.iterations.append({
+            "depth": depth,
+            "seconds": time.perf_counter() - started,
+            "nodes": self.nodes - self._iteration_nodes,
+        })
+        self._iteration_nodes = self.nodes
+
+    @property
+    def move_branching(self):
+        return self.moves / self.expanded if self.expanded else 0.0
+
+    @property
+    def blackout_branching(self):
+        return self.blackout_pairs / self.move_expansions if self.move_expansions else 0.0
+
+    def finish(self):
+        # the search is over; elapsed stops here
+        self._finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    def as_dict(self):
+        elapsed = self.elapsed
+        return {
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "cutoffs": self.cutoffs,
+            "cutoff_plies": {str(ply): n for ply, n in sorted(self.cutoff_plies.items())},
+            "researches": self.researches,
+            "aspiration_researches": self.aspiration_researches,
+            "move_branching": round(self.move_branching, 3),
+            "blackout_branching": round(self.blackout_branching, 3),
+            "tt_hits": self.tt_hits,
+            "tt_probes": self.tt_probes,
+            "endgame_solved": self.endgame_solved,
+            "iterations": self.iterations,
+            "seconds": elapsed,
+            "nodes_per_sec": self.nodes / elapsed if elapsed > 0 else 0.0,
+        }
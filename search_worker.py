@@ -0,0 +1,120 @@
+"""Engine searches on a background thread, for the Tk GUI.
+
+The worker owns its own Game, loaded with the position of every job, so
+the GUI's game is never touched by the search and the worker's
+transposition tables carry over from one search to the next.  Searches
+are iterative deepening up to the requested depth: cancelling one ("move
+now") still leaves the action of the deepest completed iteration, and
+restarting at another depth reuses the table.
+
+A job may ponder: first guess the opponent's reply, then search the
+position that reply leads to.  When the opponent really plays it, the job
+is adopted as is; otherwise it is discarded.
+"""
+import math
+import threading
+
+from game import Game, SearchTimeout, opposite
+
+
+class SearchJob:
+    """One search request and, once ``done``, its action."""
+
+    def __init__(self, state, player, depth, seconds=None, ponder_depth=None):
+        self.state = state
+        self.player = player
+        self.depth = depth
+        self.seconds = seconds
+        self.ponder_depth = ponder_depth
+        # pondering: the guessed reply, and the position it leads to
+        self.guess = None
+        self.target = None if ponder_depth else state
+        self.action = None
+        self.error = None
+        self.cancelled = False
+        # set by SearchWorker.cancel, even before the search has started
+        self.stopped = False
+        self.done = False
+
+
+class SearchWorker:
+    def __init__(self):
+        self.engine = None
+        self.job = None
+        self._thread = None
+
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, state, player, depth, seconds=None, ponder_depth=None):
+        """Start a search of ``state`` for ``player``.  With ``ponder_depth``
+        the opponent of ``player`` is to move in ``state``."""
+        if self.busy():
+            raise RuntimeError("a search is still running")
+        # clear a cancel of an earlier job here, not on the worker thread,
+        # so that one arriving before the new job starts searching holds
+        if self.engine is not None:
+            self.engine._cancelled = False
+        self.job = SearchJob(state, player, depth, seconds, ponder_depth)
+        self._thread = threading.Thread(target=self._run, args=(self.job,), daemon=True)
+        self._thread.start()
+        return self.job
+
+    def cancel(self, discard=True):
+        """Stop the running job.  With discard=False its action is still
+        used (the deepest completed iteration), otherwise it is dropped."""
+        job = self.job
+        if job is None or job.done:
+            return
+        if discard:
+            job.cancelled = True
+        job.stopped = True
+        if self.engine is not None:
+            self.engine.cancel()
+
+    def progress(self):
+        """``(completed depth, nodes searched)`` of the running job."""
+        engine = self.engine
+        if engine is None or self.job is None:
+            return 0, 0
+        stats = engine.stats
+        return engine.last_depth, stats.nodes if stats is not None else 0
+
+    def _load(self, job):
+        state = job.state
+        if self.engine is None or self.engine.size != state[0]:
+            engine = Game.from_state(state)
+            engine.collect_stats = True
+            # a cancel that came before this engine existed
+            if job.stopped:
+                engine.cancel()
+            self.engine = engine
+        else:
+            self.engine.set_state(state)
+        return self.engine
+
+    def _run(self, job):
+        try:
+            engine = self._load(job)
+            if job.cancelled:
+                return
+            if job.ponder_depth:
+                job.guess = engine.best_action_for(opposite(job.player), job.ponder_depth)
+                if job.guess is None:
+                    return
+                move, blacks = job.guess
+                engine.apply_move(move, opposite(job.player))
+                if blacks:
+                    engine.apply_blackouts(blacks)
+                engine.current_player = job.player
+                job.target = engine.state()
+            if job.cancelled:
+                return
+            seconds = job.seconds if job.seconds else math.inf
+            job.action = engine.best_action_within(job.player, seconds, job.depth)
+        except SearchTimeout:
+            job.cancelled = True
+        except Exception as e:
+            job.error = e
+        finally:
+            job.done = True
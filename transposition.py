@@ -0,0 +1,127 @@
+"""Zobrist hashing and a bounded transposition table for Game.minimax."""
+import random
+from functools import lru_cache
+
+from bitboard import symmetry_maps
+
+EXACT = 0
+LOWER = 1   # stored score is a lower bound (the search failed high)
+UPPER = 2   # stored score is an upper bound (the search failed low)
+
+# Game.hash packs the hashes of all 8 symmetric images of the position into
+# one int, one 64-bit lane per transform (see bitboard.symmetry_maps)
+LANES = 8
+LANE_MASK = 2**64 - 1
+
+# rough cost of one stored entry (entry tuple, key, score, action tuples)
+ENTRY_BYTES = 256
+DEFAULT_TT_BYTES = 32 * 2**20
+
+
+class ZobristKeys:
+    """Random 64-bit keys for one board size.
+
+    A position hashes to the XOR of ``blocked[i]`` for every non-empty cell,
+    ``pawn[player][i]`` for each pawn cell and ``side`` when PLAYER2 is to
+    move.  The ``packed_*`` keys hold, in lane ``t``, the key of the cell that
+    transform ``t`` maps the cell to, so XOR-ing them hashes all 8 images of
+    a position at once.
+    """
+
+    def __init__(self, size, seed=0x15013):
+        rng = random.Random(seed)
+        cells = size * size
+        self.blocked = tuple(rng.getrandbits(64) for _ in range(cells))
+        self.pawn = (None,
+                     tuple(rng.getrandbits(64) for _ in range(cells)),
+                     tuple(rng.getrandbits(64) for _ in range(cells)))
+        self.side = rng.getrandbits(64)
+
+        maps = symmetry_maps(size)
+
+        def pack(keys):
+            return tuple(sum(keys[perm[i]] << (64 * t) for t, perm in enumerate(maps))
+                         for i in range(cells))
+
+        self.packed_blocked = pack(self.blocked)
+        self.packed_pawn = (None, pack(self.pawn[1]), pack(self.pawn[2]))
+        self.packed_side = sum(self.side << (64 * t) for t in range(LANES))
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(size):
+    return ZobristKeys(size)
+
+
+def canonical_lane(packed):
+    """``(key, transform)`` of the smallest lane of a packed hash.
+
+    Symmetric positions share the same 8 lanes, so the smallest one is a key
+    of the canonical form and ``transform`` maps the position onto it.
+    """
+    lanes = [(packed >> shift) & LANE_MASK for shift in range(0, 64 * LANES, 64)]
+    key = min(lanes)
+    return key, lanes.index(key)
+
+
+class TranspositionTable:
+    """Fixed size two-tier table.
+
+    Every bucket has a depth-preferred slot, which only gives way to an
+    entry searched at least as deep, and an always-replace slot that keeps
+    the most recent entry pushed out of (or refused by) the first one.
+    Entries are ``(key, depth, flag, score, action)`` tuples.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_TT_BYTES):
+        self.max_bytes = max_bytes
+        self.buckets = max(1, max_bytes // ENTRY_BYTES // 2)
+        self._deep = [None] * self.buckets
+        self._recent = [None] * self.buckets
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def __len__(self):
+        return (self.buckets - self._deep.count(None)) + (self.buckets - self._recent.count(None))
+
+    def clear(self):
+        self._deep = [None] * self.buckets
+        self._recent = [None] * self.buckets
+
+    def probe(self, key):
+        index = key % self.buckets
+        entry = self._deep[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self._recent[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, score, action):
+        index = key % self.buckets
+        entry = (key, depth, flag, score, action)
+        deep = self._deep[index]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            self._deep[index] = entry
+            if deep is None or deep[0] == key:
+                return
+            # demote the shallower entry to the always-replace slot
+            entry = deep
+        recent = self._recent[index]
+        if recent is not None and recent[0] != entry[0]:
+            self.overwrites += 1
+        self._recent[index] = entry
+
+    def stats(self):
+        return {
+            "entries": len(self),
+            "capacity": 2 * self.buckets,
+            "hits": self.hits,
+            "misses": self.misses,
+            "overwrites": self.overwrites,
+        }
@@ -1,18 +1,41 @@
 import json
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 
+from results_store import SUMMARY_COLUMNS, ResultsStore, position_label
+
+# pandas, matplotlib and seaborn are slow to import, so every method imports
+# what it uses and nothing is loaded until a tournament is summarised
+
 class TournamentVisualizer:
     def __init__(self, results_dir="tournament_results"):
         self.results_dir = results_dir
         self.data = None
         self.summary_data = None
+        # statistics shared by the plots and the report, see aggregate
+        self._aggregates = None
         
     def load_latest_tournament(self):
-        """Load the most recent tournament results"""
+        """Load the summary of the most recent tournament, from the results
+        database when there is one, else from the newest JSON file"""
+        store_path = os.path.join(self.results_dir, "results.sqlite")
+        if os.path.exists(store_path):
+            store = ResultsStore(store_path)
+            try:
+                tournament = store.latest_tournament()
+                if tournament is not None:
+                    # only the summary columns of the match rows are read,
+                    # games and moves stay in the database
+                    import pandas as pd
+                    sql, parameters = store.summary_query(tournament, SUMMARY_COLUMNS)
+                    self.summary_data = pd.read_sql_query(sql, store.conn, params=parameters)
+                    self._aggregates = None
+                    self.data = {"timestamp": tournament}
+                    print(f"Loaded tournament {tournament} from {store_path}")
+                    return self.data
+            finally:
+                store.close()
+
         tournament_files = [f for f in os.listdir(self.results_dir) 
                             if f.startswith("tournament_") and f.endswith(".json")]
         if not tournament_files:
@@ -24,14 +47,16 @@ class TournamentVisualizer:
         with open(file_path, 'r') as f:
             self.data = json.load(f)
             
+        import pandas as pd
+        self._aggregates = None
         self.summary_data = pd.DataFrame([
             {
                 "config1_name": match["config1"]["name"],
-                "config1_depth": match["config1"]["depth"],
-                "config1_position": str(match["config1"].get("start_pos", "default")),
+                "config1_depth": match["config1"].get("depth"),
+                "config1_position": position_label(match["config1"].get("start_pos")),
                 "config2_name": match["config2"]["name"],
-                "config2_depth": match["config2"]["depth"],
-                "config2_position": str(match["config2"].get("start_pos", "default")),
+                "config2_depth": match["config2"].get("depth"),
+                "config2_position": position_label(match["config2"].get("start_pos")),
                 "config1_wins": match["results"]["summary"]["config1_wins"],
                 "config2_wins": match["results"]["summary"]["config2_wins"],
                 "avg_moves": match["results"]["summary"]["avg_moves"],
@@ -43,30 +68,56 @@ class TournamentVisualizer:
         print(f"Loaded tournament data from {latest_file}")
         return self.data
     
-    def plot_win_rates_by_depth(self):
-        """Plot win rates for different search depths"""
+    def aggregate(self):
+        """Depth, position and depth x position statistics, computed once.
+
+        Every match is split into one row per participant (the long form),
+        which is grouped by each key.  A participant's win rate is its wins
+        over the games it played; matches, average moves and duration count
+        each match once per group, even when both sides fall in the group.
+        """
         if self.summary_data is None:
             raise ValueError("No tournament data loaded")
-        
-        depth_stats = []
-        for depth in range(1, 5):  # depths used in tournament
-            depth_matches = self.summary_data[
-                (self.summary_data["config1_depth"] == depth) | 
-                (self.summary_data["config2_depth"] == depth)
-            ]
-            wins_as_config1 = depth_matches[depth_matches["config1_depth"] == depth]["config1_wins"].sum()
-            wins_as_config2 = depth_matches[depth_matches["config2_depth"] == depth]["config2_wins"].sum()
-            total_matches = len(depth_matches)
-            if total_matches == 0:
-                continue
-            win_rate = (wins_as_config1 + wins_as_config2) / total_matches
-            depth_stats.append({
-                "depth": depth,
-                "win_rate": win_rate,
-                "total_matches": total_matches
-            })
-
-        df = pd.DataFrame(depth_stats)
+        if self._aggregates is None:
+            import pandas as pd
+            s = self.summary_data
+            games = s["config1_wins"] + s["config2_wins"]
+            long = pd.concat([
+                pd.DataFrame({
+                    "match": s.index,
+                    "depth": s[f"{side}_depth"].astype("Int64"),
+                    "position": s[f"{side}_position"],
+                    "wins": s[f"{side}_wins"],
+                    "games": games,
+                    "avg_moves": s["avg_moves"],
+                    "avg_duration_sec": s["avg_duration_sec"],
+                })
+                for side in ("config1", "config2")
+            ], ignore_index=True)
+            self._aggregates = {
+                "depth": self._group(long, ["depth"]),
+                "position": self._group(long, ["position"]),
+                "depth_position": self._group(long, ["depth", "position"]),
+            }
+        return self._aggregates
+
+    @staticmethod
+    def _group(long, keys):
+        totals = long.groupby(keys).agg(wins=("wins", "sum"), games=("games", "sum"))
+        per_match = long.drop_duplicates(["match"] + keys).groupby(keys).agg(
+            total_matches=("match", "size"),
+            avg_moves=("avg_moves", "mean"),
+            avg_duration_sec=("avg_duration_sec", "mean"))
+        stats = totals.join(per_match)
+        stats["win_rate"] = (stats["wins"] / stats["games"].where(stats["games"] > 0)).fillna(0.0)
+        return stats.reset_index()
+
+    def plot_win_rates_by_depth(self):
+        """Plot win rates for different search depths"""
+        df = self.aggregate()["depth"]
+
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         plt.figure(figsize=(10, 6))
         sns.barplot(data=df, x="depth", y="win_rate")
         plt.title("Win Rate by Search Depth")
@@ -82,30 +133,10 @@ class TournamentVisualizer:
     
     def plot_win_rates_by_position(self):
         """Plot win rates for different starting positions"""
-        if self.summary_data is None:
-            raise ValueError("No tournament data loaded")
-        
-        position_stats = []
-        positions = self.summary_data["config1_position"].unique()
-        
-        for pos in positions:
-            pos_matches = self.summary_data[
-                (self.summary_data["config1_position"] == pos) | 
-                (self.summary_data["config2_position"] == pos)
-            ]
-            wins_as_config1 = pos_matches[pos_matches["config1_position"] == pos]["config1_wins"].sum()
-            wins_as_config2 = pos_matches[pos_matches["config2_position"] == pos]["config2_wins"].sum()
-            total_matches = len(pos_matches)
-            if total_matches == 0:
-                continue
-            win_rate = (wins_as_config1 + wins_as_config2) / total_matches
-            position_stats.append({
-                "position": pos,
-                "win_rate": win_rate,
-                "total_matches": total_matches
-            })
-
-        df = pd.DataFrame(position_stats)
+        df = self.aggregate()["position"]
+
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         plt.figure(figsize=(12, 6))
         sns.barplot(data=df, x="position", y="win_rate")
         plt.title("Win Rate by Starting Position")
@@ -123,24 +154,10 @@ class TournamentVisualizer:
     
     def plot_avg_moves_by_depth(self):
         """Plot average number of moves by search depth"""
-        if self.summary_data is None:
-            raise ValueError("No tournament data loaded")
-        
-        depth_stats = []
-        for depth in range(1, 5):
-            depth_matches = self.summary_data[
-                (self.summary_data["config1_depth"] == depth) | 
-                (self.summary_data["config2_depth"] == depth)
-            ]
-            if len(depth_matches) == 0:
-                continue
-            avg_moves = depth_matches["avg_moves"].mean()
-            depth_stats.append({
-                "depth": depth,
-                "avg_moves": avg_moves
-            })
-
-        df = pd.DataFrame(depth_stats)
+        df = self.aggregate()["depth"]
+
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         plt.figure(figsize=(10, 6))
         sns.barplot(data=df, x="depth", y="avg_moves")
         plt.title("Average Game Length by Search Depth")
@@ -152,8 +169,7 @@ class TournamentVisualizer:
     
     def generate_summary_report(self):
         """Generate a comprehensive summary report"""
-        if self.summary_data is None:
-            raise ValueError("No tournament data loaded")
+        aggregates = self.aggregate()
 
         report = []
         report.append("# Tournament Summary Report")
@@ -167,43 +183,21 @@ class TournamentVisualizer:
         report.append(f"Longest game: {self.summary_data['avg_moves'].max():.2f} moves\n")
 
         report.append("## Analysis by Search Depth")
-        for depth in range(1, 5):
-            depth_matches = self.summary_data[
-                (self.summary_data["config1_depth"] == depth) | 
-                (self.summary_data["config2_depth"] == depth)
-            ]
-            if len(depth_matches) == 0:
-                continue
-            wins_as_config1 = depth_matches[depth_matches["config1_depth"] == depth]["config1_wins"].sum()
-            wins_as_config2 = depth_matches[depth_matches["config2_depth"] == depth]["config2_wins"].sum()
-            total_matches = len(depth_matches)
-            win_rate = (wins_as_config1 + wins_as_config2) / total_matches
-
-            report.append(f"\n### Depth {depth}")
-            report.append(f"Total matches: {total_matches}")
-            report.append(f"Win rate: {win_rate:.2%}")
-            report.append(f"Average game length: {depth_matches['avg_moves'].mean():.2f} moves")
-            report.append(f"Average duration: {depth_matches['avg_duration_sec'].mean():.2f} sec")
+        for row in aggregates["depth"].itertuples():
+            report.append(f"\n### Depth {row.depth}")
+            self._report_stats(report, row)
 
         report.append("\n## Analysis by Starting Position")
-        positions = self.summary_data["config1_position"].unique()
-        for pos in positions:
-            pos_matches = self.summary_data[
-                (self.summary_data["config1_position"] == pos) | 
-                (self.summary_data["config2_position"] == pos)
-            ]
-            if len(pos_matches) == 0:
-                continue
-            wins_as_config1 = pos_matches[pos_matches["config1_position"] == pos]["config1_wins"].sum()
-            wins_as_config2 = pos_matches[pos_matches["config2_position"] == pos]["config2_wins"].sum()
-            total_matches = len(pos_matches)
-            win_rate = (wins_as_config1 + wins_as_config2) / total_matches
-
-            report.append(f"\n### Position {pos}")
-            report.append(f"Total matches: {total_matches}")
-            report.append(f"Win rate: {win_rate:.2%}")
-            report.append(f"Average game length: {pos_matches['avg_moves'].mean():.2f} moves")
-            report.append(f"Average duration: {pos_matches['avg_duration_sec'].mean():.2f} sec")
+        for row in aggregates["position"].itertuples():
+            report.append(f"\n### Position {row.position}")
+            self._report_stats(report, row)
+
+        report.append("\n## Analysis by Search Depth and Starting Position")
+        report.append("\n| Depth | Position | Matches | Win rate | Average moves | Average duration |")
+        report.append("|---|---|---|---|---|---|")
+        for row in aggregates["depth_position"].itertuples():
+            report.append(f"| {row.depth} | {row.position} | {row.total_matches} | {row.win_rate:.2%} "
+                          f"| {row.avg_moves:.2f} | {row.avg_duration_sec:.2f} sec |")
 
         report_path = os.path.join(self.results_dir, "tournament_summary.md")
         with open(report_path, 'w') as f:
@@ -211,6 +205,13 @@ class TournamentVisualizer:
         
         print(f"Summary report saved to: {report_path}")
 
+    @staticmethod
+    def _report_stats(report, row):
+        report.append(f"Total matches: {row.total_matches}")
+        report.append(f"Win rate: {row.win_rate:.2%}")
+        report.append(f"Average game length: {row.avg_moves:.2f} moves")
+        report.append(f"Average duration: {row.avg_duration_sec:.2f} sec")
+
 def main():
     visualizer = TournamentVisualizer()
     